@@ -0,0 +1,355 @@
+"""
+This file contains the post-game analysis: every ply of a game is searched in parallel and summarised in a report.
+"""
+# imports
+import argparse
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import Engine
+import Search
+
+from utils import BLUNDER_THRESHOLD, DEFAULT_PROMOTION, PAWN_PROMOTION
+
+
+def register_logged_move(game_state, logged_move):
+    """
+    Function that registers a move taken from a "moves_log" list, including its promotion.
+    :param game_state: A GameState object.
+    :param logged_move: A dictionary object documenting a move, as found in GameState.moves_log.
+    :return: nothing
+    """
+    game_state.register_move([Engine.get_computer_notation_for_position(logged_move["start_position"]),
+                              Engine.get_computer_notation_for_position(logged_move["final_position"])])
+    if logged_move["additional_info"] == PAWN_PROMOTION:
+        game_state.promote(logged_move.get("promotion", DEFAULT_PROMOTION))
+
+
+def replay_moves_log(moves_log):
+    """
+    Generator that rebuilds every position of a game from its "moves_log" list, starting from the initial position.
+    The same GameState object is yielded every time, updated with one more move.
+    :param moves_log: A list of dictionaries documenting moves, as found in GameState.moves_log.
+    :return: A generator of GameState objects, one more than the number of moves.
+    """
+    game_state = Engine.GameState()
+    yield game_state
+    for logged_move in moves_log:
+        register_logged_move(game_state, logged_move)
+        yield game_state
+
+
+def analyse_position(moves_log, max_depth, time_limit, node_limit, scored_moves=()):
+    """
+    Function that rebuilds a position from a "moves_log" list and searches it. It is run by the worker processes.
+    :param moves_log: A list of dictionaries documenting the moves that lead to the position.
+    :param max_depth: The maximum number of plies to search.
+    :param time_limit: The maximum number of seconds the search can take or None for no limit.
+    :param node_limit: The maximum number of nodes the search can visit or None for no limit.
+    :param scored_moves: Moves in chess notation, "E2E4", to be scored at the depth reached by the search, so that their
+    scores can be compared with the score of the position.
+    :return: A dictionary object of this form
+    {"score": 35, "best_move": "E2E4", "pv": ["E2E4", "E7E5"], "depth": 3, "nodes": 1024, "move_scores": {"D2D4": 30}}
+    The scores are from the perspective of the player to move.
+    """
+    game_state = Engine.GameState()
+    for logged_move in moves_log:
+        register_logged_move(game_state, logged_move)
+    result = Search.search(game_state, max_depth, time_limit, node_limit)
+    move_scores = {}
+    for move in scored_moves:
+        move_scores[move] = Search.score_move(game_state, Engine.get_computer_notation_for_move(move),
+                                              max(1, result["depth"]))
+    return {
+        "score": result["score"],
+        "best_move": None if result["best_move"] is None else Engine.get_chess_notation_for_move(result["best_move"]),
+        "pv": Search.get_notation_for_line(result["pv"]),
+        "depth": result["depth"],
+        "nodes": result["nodes"],
+        "move_scores": move_scores
+    }
+
+
+def analyse_position_multi_pv(moves_log, pv_count, max_depth, time_limit, node_limit):
+    """
+    Function that rebuilds a position from a "moves_log" list and searches its best moves. It is run by the worker
+    processes.
+    :param moves_log: A list of dictionaries documenting the moves that lead to the position.
+    :param pv_count: The number of best moves to return.
+    :param max_depth: The maximum number of plies to search.
+    :param time_limit: The maximum number of seconds the search can take or None for no limit.
+    :param node_limit: The maximum number of nodes the search can visit or None for no limit.
+    :return: A dictionary object of this form
+    {"lines": [{"move": "E2E4", "score": 35, "pv": ["E2E4", "E7E5"]}, ...], "depth": 3, "nodes": 1024}
+    The scores are from the perspective of the player to move.
+    """
+    game_state = Engine.GameState()
+    for logged_move in moves_log:
+        register_logged_move(game_state, logged_move)
+    result = Search.search_multi_pv(game_state, pv_count, max_depth, time_limit, node_limit)
+    return {
+        "lines": [{"move": Engine.get_chess_notation_for_move(line["move"]), "score": line["score"],
+                   "pv": Search.get_notation_for_line(line["pv"])} for line in result["lines"]],
+        "depth": result["depth"],
+        "nodes": result["nodes"]
+    }
+
+
+def get_hint_executor():
+    """
+    Function that creates the process pool of a HintAnalyser: a single spawned worker, which does not inherit the state
+    of the GUI process.
+    :return: A ProcessPoolExecutor object.
+    """
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+
+class HintAnalyser:
+    """
+    This class is used to analyse positions in the background, one depth at a time, and to keep the deepest multi-PV
+    result of every analysed position. Results are read from the cache without waiting, so hints for a position that
+    was already analysed are available at once.
+    """
+
+    def __init__(self, pv_count=3, max_depth=3):
+        """
+        Constructor of HintAnalyser class.
+        :param pv_count: The number of best moves to analyse.
+        :param max_depth: The depth at which the analysis of a position stops.
+        :return: A HintAnalyser object.
+        """
+        self.executor = get_hint_executor()
+        self.pv_count = pv_count
+        self.max_depth = max_depth
+        self.results = {}  # Deepest result by position key.
+        self.failed_position_keys = set()  # Positions whose analysis failed, they are not analysed again.
+        self.future = None
+        self.future_position_key = None
+
+    def get_hints(self, game_state):
+        """
+        Function that returns the deepest result available for the position of a GameState object, without waiting.
+        :param game_state: A GameState object.
+        :return: A dictionary object, as returned by analyse_position_multi_pv, or None if the position was not
+        analysed yet.
+        """
+        return self.results.get(game_state.get_position_key())
+
+    def update(self, game_state):
+        """
+        Function that stores the result of a finished analysis and starts analysing the position of a GameState object
+        one depth deeper than its cached result, until max_depth is reached. A failed analysis is dropped and its
+        position is not analysed again.
+        :param game_state: A GameState object.
+        :return: True if an analysis is running, False otherwise.
+        """
+        if self.future is not None and self.future.done():
+            try:
+                result = self.future.result()
+            except Exception:
+                result = None
+                self.failed_position_keys.add(self.future_position_key)
+            cached_result = self.results.get(self.future_position_key)
+            if result is not None and (cached_result is None or cached_result["depth"] < result["depth"]):
+                self.results[self.future_position_key] = result
+            self.future = None
+        if self.future is None and not game_state.await_promotion \
+                and game_state.get_position_key() not in self.failed_position_keys:
+            position_key = game_state.get_position_key()
+            cached_result = self.results.get(position_key)
+            depth = 0 if cached_result is None else cached_result["depth"]
+            if depth < self.max_depth and (cached_result is None or len(cached_result["lines"]) != 0):
+                arguments = (list(game_state.moves_log), self.pv_count, depth + 1, None, None)
+                try:
+                    self.future = self.executor.submit(analyse_position_multi_pv, *arguments)
+                except BrokenProcessPool:  # the worker died, the pool cannot be used anymore and is replaced
+                    self.executor.shutdown(wait=False)
+                    self.executor = get_hint_executor()
+                    self.future = self.executor.submit(analyse_position_multi_pv, *arguments)
+                self.future_position_key = position_key
+        return self.future is not None
+
+    def close(self):
+        """
+        Function that stops the background analysis. The worker is terminated, otherwise the exit of the interpreter
+        would wait for the running analysis to finish.
+        :return: nothing
+        """
+        processes = list(self.executor._processes.values())  # the executor has no public way to terminate them
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+            process.join()
+        self.future = None
+
+
+class AnalysisCache:
+    """
+    This class is used to store analysis results by position, so that positions recurring across games are only
+    searched once. The results can be saved to and loaded from a JSON file.
+    """
+
+    def __init__(self, path=None):
+        """
+        Constructor of AnalysisCache class.
+        :param path: The path of the JSON file backing the cache or None for a cache kept only in memory.
+        :return: An AnalysisCache object.
+        """
+        self.path = path
+        self.results = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as cache_file:
+                self.results = json.load(cache_file)
+
+    def get(self, position_key):
+        """
+        Function that returns the stored result for a position.
+        :param position_key: A position key, as returned by GameState.get_position_key.
+        :return: A result dictionary as returned by analyse_position or None if the position was not analysed.
+        """
+        return self.results.get(repr(position_key))
+
+    def put(self, position_key, result):
+        """
+        Function that stores the result for a position. A deeper stored result is kept and the move scores of results
+        of the same depth are merged.
+        :param position_key: A position key, as returned by GameState.get_position_key.
+        :param result: A result dictionary as returned by analyse_position.
+        :return: nothing
+        """
+        key = repr(position_key)
+        stored_result = self.results.get(key)
+        if stored_result is None or stored_result["depth"] < result["depth"]:
+            self.results[key] = result
+        elif stored_result["depth"] == result["depth"]:
+            result["move_scores"] = dict(stored_result.get("move_scores", {}), **result["move_scores"])
+            self.results[key] = result
+
+    def save(self):
+        """
+        Function that writes the cache to its JSON file, if it has one.
+        :return: nothing
+        """
+        if self.path is not None:
+            with open(self.path, "w") as cache_file:
+                json.dump(self.results, cache_file)
+
+
+def analyse_game(moves_log, max_depth=3, time_limit=None, node_limit=None, workers=None, cache=None):
+    """
+    Generator that searches every position of a game in a process pool and yields the results in ply order, as soon as
+    they are available. The move played from every position is scored by the search of that position. Positions found
+    in the cache at max_depth or deeper, with their played moves scored, are not searched again; the cache is updated
+    with new results.
+    :param moves_log: A list of dictionaries documenting moves, as found in GameState.moves_log.
+    :param max_depth: The maximum number of plies to search in each position.
+    :param time_limit: The maximum number of seconds to search each position or None for no limit.
+    :param node_limit: The maximum number of nodes to search in each position or None for no limit.
+    :param workers: The number of worker processes or None to use one per CPU.
+    :param cache: An AnalysisCache object or None.
+    :return: A generator of (ply, result) tuples, where ply 0 is the initial position and result is a dictionary as
+    returned by analyse_position.
+    """
+    cache = cache if cache is not None else AnalysisCache()
+    position_keys = []
+    played_moves = {}  # moves played from every position, several if the position is repeated inside the game
+    for ply, game_state in enumerate(replay_moves_log(moves_log)):
+        position_key = game_state.get_position_key()
+        position_keys.append(position_key)
+        moves = played_moves.setdefault(position_key, [])
+        if ply < len(moves_log):
+            move = moves_log[ply]["start_position"] + moves_log[ply]["final_position"]
+            if move not in moves:
+                moves.append(move)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}  # positions repeated inside the game are only submitted once
+        for ply, position_key in enumerate(position_keys):
+            cached_result = cache.get(position_key)
+            if position_key not in futures and (cached_result is None or cached_result["depth"] < max_depth or any(
+                    move not in cached_result.get("move_scores", {}) for move in played_moves[position_key])):
+                futures[position_key] = executor.submit(analyse_position, moves_log[:ply], max_depth, time_limit,
+                                                        node_limit, played_moves[position_key])
+        for ply, position_key in enumerate(position_keys):
+            if position_key in futures:
+                cache.put(position_key, futures.pop(position_key).result())
+            yield ply, cache.get(position_key)
+
+
+def get_white_score(ply, score):
+    """
+    Function that converts a score from the perspective of the player to move to the perspective of the white player.
+    :param ply: The number of moves made from the initial position.
+    :param score: A score from the perspective of the player to move.
+    :return: The score from the perspective of the white player.
+    """
+    return score if ply % 2 == 0 else -score
+
+
+def get_game_report(moves_log, max_depth=3, time_limit=None, node_limit=None, workers=None, cache=None):
+    """
+    Function that analyses a game and summarises it: the evaluation curve, the best move for every ply and the moves
+    that lost at least BLUNDER_THRESHOLD centipawns.
+    :param moves_log: A list of dictionaries documenting moves, as found in GameState.moves_log.
+    :param max_depth: The maximum number of plies to search in each position.
+    :param time_limit: The maximum number of seconds to search each position or None for no limit.
+    :param node_limit: The maximum number of nodes to search in each position or None for no limit.
+    :param workers: The number of worker processes or None to use one per CPU.
+    :param cache: An AnalysisCache object or None.
+    :return: A dictionary object of this form
+    {"eval_curve": [0, 35, ...], "plies": [{"ply": 1, "move": "E2E4", "best_move": "D2D4", "loss": 0,
+    "blunder": False}, ...], "blunders": [14, 27]}
+    The evaluation curve is from the perspective of the white player and has one more entry than the number of moves.
+    """
+    results = [result for _, result in analyse_game(moves_log, max_depth, time_limit, node_limit, workers, cache)]
+    plies = []
+    for ply, logged_move in enumerate(moves_log):
+        move = logged_move["start_position"] + logged_move["final_position"]
+        # both scores come from the search of the position before the move, to the same depth
+        loss = 0
+        if move != results[ply]["best_move"]:
+            loss = max(0, results[ply]["score"] - results[ply]["move_scores"][move])
+        plies.append({
+            "ply": ply + 1,
+            "move": move,
+            "best_move": results[ply]["best_move"],
+            "loss": loss,
+            "blunder": loss >= BLUNDER_THRESHOLD
+        })
+    return {
+        "eval_curve": [get_white_score(ply, result["score"]) for ply, result in enumerate(results)],
+        "plies": plies,
+        "blunders": [ply["ply"] for ply in plies if ply["blunder"]]
+    }
+
+
+def main():
+    """
+    Main function of the analysis tool. It reads a "moves_log" list from a JSON file and writes the game report as JSON.
+    :return: nothing
+    """
+    parser = argparse.ArgumentParser(description="Analyse every ply of a game.")
+    parser.add_argument("game", help="JSON file holding the moves_log list of a GameState object")
+    parser.add_argument("--depth", type=int, default=3, help="maximum search depth per ply")
+    parser.add_argument("--time", type=float, default=None, help="maximum search time per ply, in seconds")
+    parser.add_argument("--nodes", type=int, default=None, help="maximum searched nodes per ply")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--cache", default=None, help="JSON file used to cache results across games")
+    parser.add_argument("--output", default=None, help="file the report is written to, instead of the console")
+    arguments = parser.parse_args()
+    with open(arguments.game) as game_file:
+        moves_log = json.load(game_file)
+    cache = AnalysisCache(arguments.cache)
+    report = get_game_report(moves_log, arguments.depth, arguments.time, arguments.nodes, arguments.workers, cache)
+    cache.save()
+    if arguments.output is None:
+        print(json.dumps(report, separators=(",", ":")))
+    else:
+        with open(arguments.output, "w") as output_file:
+            json.dump(report, output_file, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+This file contains the micro-benchmarks of the engine primitives. Results can be stored as a JSON baseline and later
+runs fail when a primitive got slower than the baseline by more than a given threshold.
+"""
+# imports
+import argparse
+import gc
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+
+import Engine
+import Search
+
+# Positions the primitives are timed on, in FEN:
+CORPUS = {
+    "opening": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "middlegame": "r1bq1rk1/pp2bppp/2n1pn2/2pp4/3P4/2PBPN2/PP1N1PPP/R2QK2R w KQ - 0 8",
+    "endgame": "8/5pk1/6p1/3R4/1r6/6P1/5PK1/8 w - - 0 40",
+    "castling": "r3k2r/pppq1ppp/2n2n2/2bpp3/2BPP3/2N2N2/PPPQ1PPP/R3K2R w KQkq - 0 9",
+    "en_passant": "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3"
+}
+
+# Two-sided 95% Student's t values, by degrees of freedom. Degrees of freedom missing from the table use the value of
+# the largest tabulated ones below them, which is slightly larger than the exact value and widens the interval.
+T_VALUES = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+            11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093,
+            20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980}
+
+
+def register_and_undo_moves(game_state, moves):
+    """
+    Function that registers and undoes every given move.
+    :param game_state: A GameState object.
+    :param moves: A list of moves in computer notation.
+    :return: The number of register_move + undo_move pairs.
+    """
+    for move in moves:
+        en_passant_possible = Search.make_move(game_state, move)
+        Search.unmake_move(game_state, en_passant_possible)
+    return len(moves)
+
+
+def get_all_moves(game_state, moves):
+    """
+    Function that times GameState.get_all_moves.
+    :param game_state: A GameState object.
+    :param moves: The valid moves of the position, unused.
+    :return: The number of calls.
+    """
+    game_state.get_all_moves()
+    return 1
+
+
+def get_valid_moves(game_state, moves):
+    """
+    Function that times GameState.get_valid_moves.
+    :param game_state: A GameState object.
+    :param moves: The valid moves of the position, unused.
+    :return: The number of calls.
+    """
+    game_state.get_valid_moves()
+    return 1
+
+
+def square_under_attack(game_state, moves):
+    """
+    Function that times GameState.square_under_attack on every square of the board.
+    :param game_state: A GameState object.
+    :param moves: The valid moves of the position, unused.
+    :return: The number of calls.
+    """
+    for row in range(8):
+        for col in range(8):
+            game_state.square_under_attack((row, col))
+    return 64
+
+
+def in_check(game_state, moves):
+    """
+    Function that times GameState.in_check.
+    :param game_state: A GameState object.
+    :param moves: The valid moves of the position, unused.
+    :return: The number of calls.
+    """
+    game_state.in_check()
+    return 1
+
+
+# Primitives to time. Each one takes a GameState object and its valid moves and returns the number of operations done.
+PRIMITIVES = {
+    "register_undo": register_and_undo_moves,
+    "get_all_moves": get_all_moves,
+    "get_valid_moves": get_valid_moves,
+    "square_under_attack": square_under_attack,
+    "in_check": in_check
+}
+
+
+def get_t_value(degrees_of_freedom):
+    """
+    Function that returns the two-sided 95% Student's t value for given degrees of freedom, rounded up to a value of
+    T_VALUES.
+    :param degrees_of_freedom: A positive integer.
+    :return: A float representing the t value.
+    """
+    return T_VALUES[max(table_degrees for table_degrees in T_VALUES if table_degrees <= degrees_of_freedom)]
+
+
+def time_primitive(primitive, fen, warmup, repetitions, min_sample_time):
+    """
+    Function that times a primitive on a position. The number of calls per sample is calibrated before the warmup so
+    that every sample lasts at least min_sample_time seconds.
+    :param primitive: A function from PRIMITIVES.
+    :param fen: The position, in FEN.
+    :param warmup: The number of samples run and discarded before measuring.
+    :param repetitions: The number of measured samples.
+    :param min_sample_time: The minimum duration of a sample, in seconds.
+    :return: A dictionary object of this form
+    {"ops_per_sec": 1520.5, "ci": 12.3, "samples": 10}
+    where "ci" is the half width of the 95% confidence interval of "ops_per_sec".
+    """
+    game_state = Engine.get_game_state_from_fen(fen)
+    moves = game_state.get_valid_moves()
+    calls = 1
+    while True:
+        start_time = time.perf_counter()
+        for _ in range(calls):
+            primitive(game_state, moves)
+        if time.perf_counter() - start_time >= min_sample_time:
+            break
+        calls *= 2
+    for _ in range(warmup):
+        for _ in range(calls):
+            primitive(game_state, moves)
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repetitions):
+            operations = 0
+            start_time = time.perf_counter()
+            for _ in range(calls):
+                operations += primitive(game_state, moves)
+            samples.append(operations / (time.perf_counter() - start_time))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    mean = statistics.mean(samples)
+    confidence_interval = 0.0
+    if len(samples) > 1:
+        confidence_interval = get_t_value(len(samples) - 1) * statistics.stdev(samples) / math.sqrt(len(samples))
+    return {"ops_per_sec": mean, "ci": confidence_interval, "samples": len(samples)}
+
+
+def run_benchmarks(warmup=2, repetitions=10, min_sample_time=0.05, name_filter=None):
+    """
+    Function that times every primitive on every position of the corpus.
+    :param warmup: The number of samples run and discarded before measuring.
+    :param repetitions: The number of measured samples.
+    :param min_sample_time: The minimum duration of a sample, in seconds.
+    :param name_filter: A string that benchmark names must contain or None to run all of them.
+    :return: A dictionary object of results, as returned by time_primitive, by benchmark name: "get_valid_moves/opening"
+    """
+    results = {}
+    for primitive_name, primitive in PRIMITIVES.items():
+        for position_name, fen in CORPUS.items():
+            name = primitive_name + "/" + position_name
+            if name_filter is None or name_filter in name:
+                results[name] = time_primitive(primitive, fen, warmup, repetitions, min_sample_time)
+    return results
+
+
+def get_regressions(results, baseline, threshold):
+    """
+    Function that compares results with a baseline. A benchmark regressed when even the upper bound of the confidence
+    interval of its ops/sec is slower than the baseline by more than the threshold, so that noise is not reported.
+    :param results: A dictionary object of results, as returned by run_benchmarks.
+    :param baseline: A dictionary object of results, as returned by run_benchmarks.
+    :param threshold: The accepted slowdown, as a fraction of the baseline ops/sec: 0.1 means 10%.
+    :return: A list of (benchmark name, baseline ops/sec, current ops/sec) tuples for the benchmarks that regressed.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            baseline_ops = baseline[name]["ops_per_sec"]
+            if result["ops_per_sec"] + result["ci"] < baseline_ops * (1 - threshold):
+                regressions.append((name, baseline_ops, result["ops_per_sec"]))
+    return regressions
+
+
+def print_results(results, baseline):
+    """
+    Function that prints the results as a table, with the change from the baseline when there is one.
+    :param results: A dictionary object of results, as returned by run_benchmarks.
+    :param baseline: A dictionary object of results, as returned by run_benchmarks, or an empty dictionary.
+    :return: nothing
+    """
+    print("%-32s %14s %12s %9s" % ("benchmark", "ops/sec", "+/- 95%", "change"))
+    for name, result in results.items():
+        change = ""
+        if name in baseline:
+            change = "%+.1f%%" % (100 * (result["ops_per_sec"] / baseline[name]["ops_per_sec"] - 1))
+        print("%-32s %14.1f %12.1f %9s" % (name, result["ops_per_sec"], result["ci"], change))
+
+
+def main():
+    """
+    Main function of the benchmark suite. It exits with status 1 when a benchmark regressed past the threshold.
+    :return: nothing
+    """
+    parser = argparse.ArgumentParser(description="Time the engine primitives.")
+    parser.add_argument("--warmup", type=int, default=2, help="samples discarded before measuring")
+    parser.add_argument("--repetitions", type=int, default=10, help="measured samples per benchmark")
+    parser.add_argument("--min-sample-time", type=float, default=0.05, help="minimum duration of a sample, in seconds")
+    parser.add_argument("--filter", default=None, help="only run the benchmarks whose name contains this string")
+    parser.add_argument("--baseline", default=None, help="JSON baseline to compare the results with")
+    parser.add_argument("--save-baseline", default=None, help="file the results are saved to as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="accepted slowdown, 0.1 means 10%%")
+    arguments = parser.parse_args()
+
+    baseline = {}
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    results = run_benchmarks(arguments.warmup, arguments.repetitions, arguments.min_sample_time, arguments.filter)
+    print_results(results, baseline)
+    if arguments.save_baseline is not None:
+        with open(arguments.save_baseline, "w") as baseline_file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results},
+                      baseline_file, indent=2)
+    regressions = get_regressions(results, baseline, arguments.threshold)
+    for name, baseline_ops, current_ops in regressions:
+        print("REGRESSION %s: %.1f -> %.1f ops/sec" % (name, baseline_ops, current_ops))
+    if len(regressions) != 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
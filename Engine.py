@@ -30,6 +30,28 @@ def get_computer_notation_for_position(chess_notation_position):
     return RANKS_TO_ROWS[chess_notation_position[1]], FILES_TO_COLUMNS[chess_notation_position[0]]
 
 
+def get_chess_notation_for_move(move):
+    """
+    Function that returns the chess notation for a given move in computer notation.
+    :param move: List of two tuples that represent the start and final board coordinates of a move.
+    [(start_row, start_col), (final_row, final_col)]
+    :return: A string representing the move in chess notation: "E2E4", "G8F6", etc.
+    """
+    return get_chess_notation_for_position(move[0][0], move[0][1]) + \
+        get_chess_notation_for_position(move[1][0], move[1][1])
+
+
+def get_computer_notation_for_move(chess_notation_move):
+    """
+    Function that returns the computer notation for a given move in chess notation.
+    :param chess_notation_move: A string representing the move in chess notation: "E2E4", "G8F6", etc.
+    :return: List of two tuples that represent the start and final board coordinates of the move.
+    """
+    chess_notation_move = chess_notation_move.upper()
+    return [get_computer_notation_for_position(chess_notation_move[0:2]),
+            get_computer_notation_for_position(chess_notation_move[2:4])]
+
+
 def get_move_dictionary(start_square_row, start_square_col, final_square_row, final_square_col,
                         moved_piece, captured_piece, additional_info):
     """
@@ -110,6 +132,58 @@ def is_queen_castle(start_position, final_position, moved_piece):
     return False
 
 
+def get_game_state_from_fen(fen):
+    """
+    Function that creates a GameState object from a position in Forsyth-Edwards Notation. The move counters are ignored
+    and the moves log of the created object is empty.
+    :param fen: A string representing the position in FEN: "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+    Only the piece placement field is mandatory.
+    :return: A GameState object.
+    """
+    fields = fen.split()
+    if len(fields) == 0:
+        raise ValueError("Invalid FEN: " + fen)
+    board = []
+    for rank in fields[0].split("/"):
+        row = []
+        for char in rank:
+            if char.isdigit():
+                row.extend([EMPTY_SQUARE] * int(char))
+            elif char.upper() in "KQRBNP":
+                row.append(("w" if char.isupper() else "b") + char.upper())
+            else:
+                raise ValueError("Invalid FEN: " + fen)
+        if len(row) != 8:
+            raise ValueError("Invalid FEN: " + fen)
+        board.append(row)
+    if len(board) != 8:
+        raise ValueError("Invalid FEN: " + fen)
+    side_to_move = fields[1] if len(fields) > 1 else "w"
+    castling = fields[2] if len(fields) > 2 else "-"
+    en_passant = fields[3] if len(fields) > 3 else "-"
+
+    game_state = GameState()
+    game_state.board = board
+    game_state.white_to_move = side_to_move == "w"
+    for row in range(8):
+        for col in range(8):
+            if board[row][col] == WHITE_KING:
+                game_state.white_king_location = (row, col)
+            elif board[row][col] == BLACK_KING:
+                game_state.black_king_location = (row, col)
+    game_state.white_king_right = "K" in castling
+    game_state.white_queen_right = "Q" in castling
+    game_state.black_king_right = "k" in castling
+    game_state.black_queen_right = "q" in castling
+    game_state.castling_rights_log = [get_castling_rights_dictionary(game_state.white_king_right,
+                                                                     game_state.white_queen_right,
+                                                                     game_state.black_king_right,
+                                                                     game_state.black_queen_right)]
+    if en_passant != "-":
+        game_state.en_passant_possible = get_computer_notation_for_position(en_passant.upper())
+    return game_state
+
+
 # GameState class:
 class GameState:
     """
@@ -264,6 +338,8 @@ class GameState:
         notation
         """
         temp_en_passant_possible = self.en_passant_possible
+        temp_pawn_promotion = self.pawn_promotion
+        temp_await_promotion = self.await_promotion
         temp_castling_rights_dictionary = get_castling_rights_dictionary(self.white_king_right, self.white_queen_right,
                                                                          self.black_king_right, self.black_queen_right)
         moves = self.get_all_moves()
@@ -288,6 +364,8 @@ class GameState:
             self.check_mate = False
             self.stale_mate = False
         self.en_passant_possible = temp_en_passant_possible
+        self.pawn_promotion = temp_pawn_promotion
+        self.await_promotion = temp_await_promotion
         self.white_king_right, self.white_queen_right, self.black_king_right, self.black_queen_right \
             = get_castling_rights(temp_castling_rights_dictionary)
         return moves
@@ -617,8 +695,19 @@ class GameState:
         last_move = self.moves_log[-1]
         position_to_promote = get_computer_notation_for_position(last_move["final_position"])
         self.board[position_to_promote[0]][position_to_promote[1]] = str(last_move["moved_piece"][0]) + promotion
+        last_move["promotion"] = promotion
         self.await_promotion = False
 
+    def get_position_key(self):
+        """
+        Function that returns a key identifying the current position: board layout, player to move, castling rights and
+        En Passant square. Two GameState objects that reached the same position by different moves have the same key.
+        :return: A hashable tuple.
+        """
+        return tuple(tuple(row) for row in self.board), self.white_to_move, \
+            (self.white_king_right, self.white_queen_right, self.black_king_right, self.black_queen_right), \
+            self.en_passant_possible
+
     def make_computer_move(self):
         """
         Function that makes a randomly selected valid move.
@@ -0,0 +1,240 @@
+"""
+This file contains the EPD test-suite runner: it parses tactical suites in Extended Position Description format and
+measures how many of their "bm"/"am" positions the search solves for several time budgets.
+"""
+# imports
+import argparse
+import json
+import shlex
+from concurrent.futures import ProcessPoolExecutor
+
+import Engine
+import Search
+
+from utils import WHITE_PAWN, BLACK_PAWN, WHITE_KING, BLACK_KING, EMPTY_SQUARE, DEFAULT_PROMOTION
+
+# Columns of the results table and the keys they are sorted by.
+TABLE_COLUMNS = ["id", "budget", "solved", "move", "time_to_solution", "depth", "nodes", "nps"]
+
+
+def parse_epd_line(line):
+    """
+    Function that parses a line of an EPD file.
+    :param line: A string of this form
+    '2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - bm Qg6; id "WAC.001";'
+    :return: A dictionary object of this form
+    {"fen": "2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - 0 1", "operations": {"bm": ["Qg6"],
+    "id": ["WAC.001"]}}
+    or None if the line is empty or a comment.
+    """
+    line = line.strip()
+    if line == "" or line.startswith("#"):
+        return None
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError("Invalid EPD: " + line)
+    operations = {}
+    if len(fields) == 5:
+        operation = ""
+        quoted = False
+        for char in fields[4] + ";":  # operations end with a semicolon, which can also appear inside quotes
+            if char == '"':
+                quoted = not quoted
+            if char == ";" and not quoted:
+                tokens = shlex.split(operation)
+                if len(tokens) != 0:
+                    operations[tokens[0]] = tokens[1:]
+                operation = ""
+            else:
+                operation += char
+    return {"fen": " ".join(fields[:4]) + " 0 1", "operations": operations}
+
+
+def read_epd(path):
+    """
+    Function that reads the positions of an EPD file.
+    :param path: The path of the file.
+    :return: A list of dictionaries, as returned by parse_epd_line.
+    """
+    positions = []
+    with open(path) as epd_file:
+        for line in epd_file:
+            position = parse_epd_line(line)
+            if position is not None:
+                positions.append(position)
+    return positions
+
+
+def get_san_for_move(game_state, move, valid_moves):
+    """
+    Function that returns the Standard Algebraic Notation of a move, without check and mate marks.
+    :param game_state: A GameState object.
+    :param move: A valid move in computer notation.
+    :param valid_moves: The valid moves of the position, used to disambiguate moves.
+    :return: A string representing the move in SAN: "Nf3", "exd5", "O-O", "e8=Q", etc.
+    """
+    (start_row, start_col), (final_row, final_col) = move
+    moved_piece = game_state.board[start_row][start_col]
+    captured_piece = game_state.board[final_row][final_col]
+    final_square = Engine.get_chess_notation_for_position(final_row, final_col).lower()
+    if moved_piece in (WHITE_KING, BLACK_KING) and abs(final_col - start_col) == 2:
+        return "O-O" if final_col > start_col else "O-O-O"
+    if moved_piece in (WHITE_PAWN, BLACK_PAWN):
+        san = final_square
+        if start_col != final_col:
+            san = Engine.get_chess_notation_for_position(start_row, start_col)[0].lower() + "x" + san
+        if final_row == 0 or final_row == 7:
+            san += "=" + DEFAULT_PROMOTION
+        return san
+    rivals = [other_move[0] for other_move in valid_moves if other_move[1] == move[1] and other_move[0] != move[0]
+              and game_state.board[other_move[0][0]][other_move[0][1]] == moved_piece]
+    start_square = Engine.get_chess_notation_for_position(start_row, start_col).lower()
+    disambiguation = ""
+    if len(rivals) != 0:
+        if all(rival[1] != start_col for rival in rivals):
+            disambiguation = start_square[0]
+        elif all(rival[0] != start_row for rival in rivals):
+            disambiguation = start_square[1]
+        else:
+            disambiguation = start_square
+    return moved_piece[1] + disambiguation + ("x" if captured_piece != EMPTY_SQUARE else "") + final_square
+
+
+def normalize_san(san):
+    """
+    Function that removes the parts of a SAN move that EPD files write in different ways.
+    :param san: A string representing a move in SAN: "Qg6+", "0-0", "e8=Q#", etc.
+    :return: The normalized string: "Qg6", "O-O", "e8Q", etc.
+    """
+    return san.rstrip("+#!?").replace("0", "O").replace("=", "")
+
+
+def run_position(fen, best_moves, avoid_moves, budget):
+    """
+    Function that searches a position for a time budget and tells if the search solved it. It is run by the worker
+    processes.
+    :param fen: The position, in FEN.
+    :param best_moves: The SAN moves of the "bm" operation; the position is solved if one of them is played.
+    :param avoid_moves: The SAN moves of the "am" operation; the position is solved if none of them is played.
+    :param budget: The number of seconds the search can take.
+    :return: A dictionary object of this form
+    {"budget": 1.0, "solved": True, "move": "Qg6", "time_to_solution": 0.4, "depth": 3, "nodes": 1520, "time": 0.84,
+    "nps": 1800.0}
+    where "time_to_solution" is the time of the first depth from which the search kept a solving move, or None. A
+    position is only solved by a move found by a completed depth.
+    """
+    game_state = Engine.get_game_state_from_fen(fen)
+    valid_moves = game_state.get_valid_moves()
+    best_moves = [normalize_san(move) for move in best_moves]
+    avoid_moves = [normalize_san(move) for move in avoid_moves]
+
+    def is_solution(move):
+        san = normalize_san(get_san_for_move(game_state, move, valid_moves))
+        return (len(best_moves) == 0 or san in best_moves) and san not in avoid_moves
+
+    result = Search.search(game_state, max_depth=64, time_limit=budget)
+    time_to_solution = None
+    for iteration in result["iterations"]:
+        if not is_solution(iteration["best_move"]):
+            time_to_solution = None
+        elif time_to_solution is None:
+            time_to_solution = iteration["time"]
+    solved = len(result["iterations"]) != 0 and is_solution(result["best_move"])
+    return {
+        "budget": budget,
+        "solved": solved,
+        "move": None if result["best_move"] is None else get_san_for_move(game_state, result["best_move"], valid_moves),
+        "time_to_solution": time_to_solution if solved else None,
+        "depth": result["depth"],
+        "nodes": result["nodes"],
+        "time": result["time"],
+        "nps": result["nodes"] / result["time"] if result["time"] > 0 else 0.0
+    }
+
+
+def run_suite(positions, budgets, workers=None):
+    """
+    Function that searches every position of a suite for every time budget in a process pool.
+    :param positions: A list of dictionaries, as returned by parse_epd_line.
+    :param budgets: A list of time budgets, in seconds.
+    :param workers: The number of worker processes or None to use one per CPU.
+    :return: A dictionary object of this form
+    {"results": [{"id": "WAC.001", "budget": 1.0, "solved": True, ...}, ...],
+    "summary": [{"budget": 1.0, "positions": 300, "solved": 120, "solve_rate": 0.4, "nps": 1800.0}, ...]}
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = []
+        for index, position in enumerate(positions):
+            operations = position["operations"]
+            position_id = operations.get("id", [str(index + 1)])[0]
+            for budget in budgets:
+                future = executor.submit(run_position, position["fen"], operations.get("bm", []),
+                                         operations.get("am", []), budget)
+                jobs.append((position_id, future))
+        results = []
+        for position_id, future in jobs:
+            result = future.result()
+            result["id"] = position_id
+            results.append(result)
+    summary = []
+    for budget in budgets:
+        budget_results = [result for result in results if result["budget"] == budget]
+        solved = sum(1 for result in budget_results if result["solved"])
+        total_time = sum(result["time"] for result in budget_results)
+        summary.append({
+            "budget": budget,
+            "positions": len(budget_results),
+            "solved": solved,
+            "solve_rate": solved / len(budget_results) if len(budget_results) != 0 else 0.0,
+            "nps": sum(result["nodes"] for result in budget_results) / total_time if total_time > 0 else 0.0
+        })
+    return {"results": results, "summary": summary}
+
+
+def print_table(report, sort_column="id", reverse=False):
+    """
+    Function that prints the results of a suite as a table sorted by a column, followed by the summary per budget.
+    :param report: A dictionary object, as returned by run_suite.
+    :param sort_column: One of TABLE_COLUMNS.
+    :param reverse: True to sort in descending order, False otherwise.
+    :return: nothing
+    """
+    def sort_key(result):
+        value = result[sort_column]
+        return (value is None, value if value is not None else 0)
+    print("%-16s %7s %6s %9s %9s %5s %10s %10s" % tuple(TABLE_COLUMNS))
+    for result in sorted(report["results"], key=sort_key, reverse=reverse):
+        time_to_solution = "-" if result["time_to_solution"] is None else "%.2f" % result["time_to_solution"]
+        print("%-16s %7.2f %6s %9s %9s %5d %10d %10.0f" % (result["id"], result["budget"], result["solved"],
+                                                          result["move"], time_to_solution, result["depth"],
+                                                          result["nodes"], result["nps"]))
+    print()
+    print("%7s %9s %7s %10s %10s" % ("budget", "positions", "solved", "solve_rate", "nps"))
+    for budget_summary in report["summary"]:
+        print("%7.2f %9d %7d %10.3f %10.0f" % (budget_summary["budget"], budget_summary["positions"],
+                                               budget_summary["solved"], budget_summary["solve_rate"],
+                                               budget_summary["nps"]))
+
+
+def main():
+    """
+    Main function of the EPD test-suite runner.
+    :return: nothing
+    """
+    parser = argparse.ArgumentParser(description="Measure the solve rate of EPD test suites.")
+    parser.add_argument("epd", help="EPD file with bm/am operations")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[1.0], help="time budgets per position, in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--sort", choices=TABLE_COLUMNS, default="id", help="column the table is sorted by")
+    parser.add_argument("--reverse", action="store_true", help="sort in descending order")
+    parser.add_argument("--json", default=None, help="file the results are written to as JSON")
+    arguments = parser.parse_args()
+    report = run_suite(read_epd(arguments.epd), arguments.budgets, arguments.workers)
+    print_table(report, arguments.sort, arguments.reverse)
+    if arguments.json is not None:
+        with open(arguments.json, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+This file contains the extraction of training features from positions. Positions are written in bulk to fixed-size
+NumPy shards that can be memory-mapped when loading.
+"""
+# imports
+import os
+
+import numpy as np
+
+import Analysis
+
+from utils import WHITE_PIECES, BLACK_PIECES, EMPTY_SQUARE
+
+# Order of the piece planes: the white pieces, then the black pieces.
+PLANE_PIECES = WHITE_PIECES + BLACK_PIECES
+PIECE_PLANES = {piece: plane for plane, piece in enumerate(PLANE_PIECES)}
+PIECE_PLANES[EMPTY_SQUARE] = -1
+
+# Layout of a record. Squares are numbered row * 8 + col in computer notation, so A8 is 0 and H1 is 63.
+RECORD_DTYPE = np.dtype([
+    ("planes", np.uint8, (len(PLANE_PIECES), 64)),  # 1 where the piece of the plane stands
+    ("white_to_move", np.uint8),
+    ("castling", np.uint8, (4,)),  # white king side, white queen side, black king side, black queen side
+    ("en_passant", np.int8),  # the En Passant square or -1
+    ("legal_moves", np.uint16),
+    ("label", np.float32)
+])
+SHARD_NAME = "shard_%05d.npy"
+
+
+def get_shard_names(directory):
+    """
+    Function that returns the names of the shards of a directory.
+    :param directory: The directory of the shards.
+    :return: A list of file names, in the order the shards were written.
+    """
+    return sorted((name for name in os.listdir(directory) if get_shard_number(name) is not None), key=get_shard_number)
+
+
+def get_shard_number(name):
+    """
+    Function that returns the number of a shard from its file name.
+    :param name: A file name: "shard_00042.npy"
+    :return: An integer representing the number of the shard or None if the name is not a shard name.
+    """
+    if not name.startswith("shard_") or not name.endswith(".npy") or not name[6:-4].isdigit():
+        return None
+    return int(name[6:-4])
+
+
+class ShardWriter:
+    """
+    This class is used to write position records to a directory of shards holding shard_size records each, except for
+    the last one. Records are collected in a preallocated buffer and each shard is written with a single call.
+    """
+
+    def __init__(self, directory, shard_size=65536):
+        """
+        Constructor of ShardWriter class.
+        :param directory: The directory the shards are written to. It is created if needed. The numbering of new
+        shards continues after the shards it already holds.
+        :param shard_size: The number of records in a shard.
+        :return: A ShardWriter object.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.records = np.zeros(shard_size, dtype=RECORD_DTYPE)
+        self.piece_planes = np.empty((shard_size, 64), dtype=np.int8)  # plane of the piece on every square or -1
+        self.count = 0
+        self.shards = max((get_shard_number(name) for name in get_shard_names(directory)), default=-1) + 1
+
+    def add(self, game_state, label, legal_moves=None):
+        """
+        Function that adds the record of a position.
+        :param game_state: A GameState object.
+        :param label: A number representing the training target of the position.
+        :param legal_moves: The number of valid moves in the position or None to have it computed.
+        :return: nothing
+        """
+        if legal_moves is None:
+            legal_moves = len(game_state.get_valid_moves())
+        record = self.records[self.count]
+        self.piece_planes[self.count] = [PIECE_PLANES[piece] for row in game_state.board for piece in row]
+        record["white_to_move"] = game_state.white_to_move
+        record["castling"] = (game_state.white_king_right, game_state.white_queen_right,
+                              game_state.black_king_right, game_state.black_queen_right)
+        if game_state.en_passant_possible != ():
+            record["en_passant"] = game_state.en_passant_possible[0] * 8 + game_state.en_passant_possible[1]
+        else:
+            record["en_passant"] = -1
+        record["legal_moves"] = legal_moves
+        record["label"] = label
+        self.count += 1
+        if self.count == self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Function that writes the collected records to a new shard.
+        :return: nothing
+        """
+        if self.count == 0:
+            return
+        records = self.records[:self.count]
+        piece_planes = self.piece_planes[:self.count]
+        records["planes"] = 0
+        positions, squares = np.nonzero(piece_planes >= 0)
+        records["planes"][positions, piece_planes[positions, squares], squares] = 1
+        np.save(os.path.join(self.directory, SHARD_NAME % self.shards), records)
+        self.shards += 1
+        self.count = 0
+
+    def close(self):
+        """
+        Function that writes the remaining records.
+        :return: nothing
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def extract_features(positions, directory, shard_size=65536):
+    """
+    Function that writes the records of a stream of positions to a directory of shards.
+    :param positions: An iterable of (GameState object, label) tuples.
+    :param directory: The directory the shards are written to.
+    :param shard_size: The number of records in a shard.
+    :return: The number of written records.
+    """
+    written = 0
+    with ShardWriter(directory, shard_size) as writer:
+        for game_state, label in positions:
+            writer.add(game_state, label)
+            written += 1
+    return written
+
+
+def get_game_positions(moves_log, label):
+    """
+    Generator that replays a game and yields every position of it with the same label, for example the result.
+    :param moves_log: A list of dictionaries documenting moves, as found in GameState.moves_log.
+    :param label: A number representing the training target of the positions.
+    :return: A generator of (GameState object, label) tuples. The same GameState object is updated and yielded.
+    """
+    for game_state in Analysis.replay_moves_log(moves_log):
+        yield game_state, label
+
+
+def open_shards(directory):
+    """
+    Function that memory-maps the shards of a directory without reading them.
+    :param directory: The directory of the shards.
+    :return: A list of read-only NumPy record arrays of RECORD_DTYPE, in the order the shards were written.
+    """
+    return [np.load(os.path.join(directory, name), mmap_mode="r") for name in get_shard_names(directory)]
@@ -3,82 +3,203 @@ This is the main file of the project. It is used to handle user input and to dis
 """
 
 # imports
+import json
+import os
 import sys
 
-import pygame as pg
+import Analysis
 import Engine
 
-from utils import PIECES, IMAGES, SQUARE_SIZE, HEIGHT, WIDTH, DIMENSION, EMPTY_SQUARE, MAX_FPS, PROMOTION_TEXT
+from utils import PIECES, EMPTY_SQUARE
+from gui_utils import IMAGES, SURFACES, FONTS, TEXTS, SQUARE_SIZE, HEIGHT, WIDTH, DIMENSION, MAX_FPS, PROMOTION_TEXT, \
+    NO_HIGHLIGHT, SELECTED_HIGHLIGHT, VALID_HIGHLIGHT, PIECES_DIRECTORY, SPRITE_CACHE_DIRECTORY, HINT_LINES, \
+    HINT_MAX_DEPTH, HINT_POLL_INTERVAL, HINT_COLORS
 
+pg = None  # The pygame module, imported by init_pygame so that importing this file has no GUI side effects.
 
-def init_images():
+
+def init_pygame():
     """
-    Initialize the IMAGES dictionary. Only needs to be called once, before the while loop.
+    Import and initialize pygame. Only needs to be called once, before any other GUI function.
     :return: nothing
     """
+    global pg
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    pg = pygame
+    pg.init()
+
+
+def get_sprites_signature():
+    """
+    Function that identifies the source piece images and the size they are scaled to, so that a cached sprite atlas
+    can be rebuilt when any of them changes.
+    :return: A dictionary object of this form
+    {"square_size": 64, "sources": [["bP.png", 1250, 1611000000000000000], ...]}
+    """
+    sources = []
     for piece in PIECES:
-        IMAGES[piece] = pg.transform.scale(pg.image.load("pieces/" + piece + ".png"), (SQUARE_SIZE, SQUARE_SIZE))
+        source_stat = os.stat(os.path.join(PIECES_DIRECTORY, piece + ".png"))
+        sources.append([piece + ".png", source_stat.st_size, source_stat.st_mtime_ns])
+    return {"square_size": SQUARE_SIZE, "sources": sources}
 
 
-def highlight_selection(screen, game_state, valid_positions, selected_square):
+def build_sprite_atlas(atlas_path, manifest_path, signature):
     """
-    Function that highlights the selected square and all the valid moves from it.
-    :param screen: A Pygame Display.
+    Function that scales the piece images to SQUARE_SIZE, places them side by side in the order of PIECES and saves
+    the resulting atlas in the sprite cache.
+    :param atlas_path: The path the atlas image is saved to.
+    :param manifest_path: The path the signature of the atlas is saved to.
+    :param signature: The signature of the sources, as returned by get_sprites_signature.
+    :return: A Pygame Surface holding the atlas.
+    """
+    atlas = pg.Surface((SQUARE_SIZE * len(PIECES), SQUARE_SIZE), pg.SRCALPHA)
+    for index, piece in enumerate(PIECES):
+        image = pg.image.load(os.path.join(PIECES_DIRECTORY, piece + ".png"))
+        atlas.blit(pg.transform.scale(image, (SQUARE_SIZE, SQUARE_SIZE)), (index * SQUARE_SIZE, 0))
+    try:
+        os.makedirs(SPRITE_CACHE_DIRECTORY, exist_ok=True)
+        pg.image.save(atlas, atlas_path)
+        with open(manifest_path, "w") as manifest_file:
+            json.dump(signature, manifest_file)
+    except (OSError, pg.error):  # the cache is an optimization, a read-only directory must not stop the game
+        pass
+    return atlas
+
+
+def init_images():
+    """
+    Initialize the IMAGES dictionary from the sprite atlas cached for SQUARE_SIZE, rebuilding the atlas if the piece
+    images or the window size changed. Only needs to be called once, after the display mode is set.
+    :return: nothing
+    """
+    atlas_path = os.path.join(SPRITE_CACHE_DIRECTORY, "atlas_" + str(SQUARE_SIZE) + ".png")
+    manifest_path = os.path.join(SPRITE_CACHE_DIRECTORY, "atlas_" + str(SQUARE_SIZE) + ".json")
+    signature = get_sprites_signature()
+    atlas = None
+    try:
+        with open(manifest_path) as manifest_file:
+            if json.load(manifest_file) == signature:
+                atlas = pg.image.load(atlas_path)
+    except (OSError, ValueError, pg.error):
+        atlas = None
+    if atlas is None:
+        atlas = build_sprite_atlas(atlas_path, manifest_path, signature)
+    atlas = atlas.convert_alpha()
+    for index, piece in enumerate(PIECES):
+        IMAGES[piece] = atlas.subsurface(pg.Rect(index * SQUARE_SIZE, 0, SQUARE_SIZE, SQUARE_SIZE))
+
+
+def init_surfaces():
+    """
+    Initialize the SURFACES dictionary with the pre-rendered board and the highlight surfaces. Only needs to be called
+    once, before the while loop.
+    :return: nothing
+    """
+    board_surface = pg.Surface((WIDTH, HEIGHT))
+    colors = [pg.Color("white"), pg.Color("dark gray")]
+    for row in range(DIMENSION):
+        for col in range(DIMENSION):
+            color = colors[((row + col) % 2)]
+            pg.draw.rect(board_surface, color, pg.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+    SURFACES["board"] = board_surface
+    for highlight, color in ((SELECTED_HIGHLIGHT, "light blue"), (VALID_HIGHLIGHT, "yellow")):
+        surface = pg.Surface((SQUARE_SIZE, SQUARE_SIZE))
+        surface.set_alpha(100)
+        surface.fill(pg.Color(color))
+        SURFACES[highlight] = surface
+
+
+def get_square_contents(game_state, valid_positions, selected_square):
+    """
+    Function that tells what must be drawn on every square: the piece and the highlight.
     :param game_state: A GameState object.
     :param valid_positions: A vector of tuples representing the valid positions in computer notation coordinates.
     :param selected_square: A tuple representing the selected square's position in computer notation coordinates.
-    :return: nothing
+    :return: A 8x8 2D list of (piece, highlight) tuples, where highlight is NO_HIGHLIGHT, SELECTED_HIGHLIGHT or
+    VALID_HIGHLIGHT.
     """
+    square_contents = [[(piece, NO_HIGHLIGHT) for piece in row] for row in game_state.board]
     if selected_square != ():
         row, col = selected_square
         if game_state.board[row][col][0] == ("w" if game_state.white_to_move else "b"):
-            surface = pg.Surface((SQUARE_SIZE, SQUARE_SIZE))
-            surface.set_alpha(100)
-            surface.fill(pg.Color("light blue"))
-            screen.blit(surface, (col * SQUARE_SIZE, row * SQUARE_SIZE))
-            surface.fill(pg.Color("yellow"))
+            square_contents[row][col] = (game_state.board[row][col], SELECTED_HIGHLIGHT)
             for position in valid_positions:
-                screen.blit(surface, (position[1] * SQUARE_SIZE, position[0] * SQUARE_SIZE))
+                square_contents[position[0]][position[1]] = (game_state.board[position[0]][position[1]],
+                                                             VALID_HIGHLIGHT)
+    return square_contents
 
 
-def draw_board(screen):
+def draw_square(screen, row, col, piece, highlight):
     """
-    Function that draws the squares that make up the chess board.
+    Function that draws a square of the chess board, its highlight and the piece on top of it.
     :param screen: A Pygame Display.
+    :param row: The row of the square in computer coordinates.
+    :param col: The column of the square in computer coordinates.
+    :param piece: The piece on the square or EMPTY_SQUARE.
+    :param highlight: NO_HIGHLIGHT, SELECTED_HIGHLIGHT or VALID_HIGHLIGHT.
+    :return: A Pygame Rect representing the area that was drawn.
     """
-    colors = [pg.Color("white"), pg.Color("dark gray")]
-    for row in range(DIMENSION):
-        for col in range(DIMENSION):
-            color = colors[((row + col) % 2)]
-            pg.draw.rect(screen, color, pg.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+    square_rect = pg.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+    screen.blit(SURFACES["board"], square_rect, square_rect)
+    if highlight != NO_HIGHLIGHT:
+        screen.blit(SURFACES[highlight], square_rect)
+    if piece != EMPTY_SQUARE:  # check if we have a piece at this position
+        screen.blit(IMAGES[piece], square_rect)
+    return square_rect
 
 
-def draw_pieces(screen, board):
+def draw_state(screen, square_contents, drawn_square_contents):
     """
-    Function that draws the pieces on top of the chess board.
+    Function that draws the squares whose contents changed since the last drawing.
     :param screen: A Pygame Display.
-    :param board: A 8x8 2D list representing the chess board's layout, as seen from the white player's perspective.
-    :return:
+    :param square_contents: A 8x8 2D list of (piece, highlight) tuples, as returned by get_square_contents.
+    :param drawn_square_contents: The square contents of the last drawing or None to draw all the squares.
+    :return: A list of Pygame Rects representing the areas that were drawn.
     """
+    dirty_rects = []
     for row in range(DIMENSION):
         for col in range(DIMENSION):
-            piece = board[row][col]
-            if piece != EMPTY_SQUARE:  # check if we have a piece at this position
-                screen.blit(IMAGES[piece], pg.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+            if drawn_square_contents is None or drawn_square_contents[row][col] != square_contents[row][col]:
+                piece, highlight = square_contents[row][col]
+                dirty_rects.append(draw_square(screen, row, col, piece, highlight))
+    return dirty_rects
 
 
-def draw_state(screen, game_state, valid_positions, selected_square):
+def draw_hints(screen, hints):
     """
-    Function that draws a given game state and highlights the selected square and it's valid moves.
+    Function that draws an arrow for each of the best moves of a position, the best one on top.
     :param screen: A Pygame Display.
-    :param game_state: A GameState object.
-    :param valid_positions: A vector of tuples representing the valid positions in computer notation coordinates.
-    :param selected_square: A tuple representing the selected square's position in computer notation coordinates.
-    :return:
+    :param hints: A dictionary object, as returned by Analysis.analyse_position_multi_pv.
+    :return: nothing
     """
-    draw_board(screen)
-    highlight_selection(screen, game_state, valid_positions, selected_square)
-    draw_pieces(screen, game_state.board)
+    for line, color in reversed(list(zip(hints["lines"], HINT_COLORS))):
+        start_position = Engine.get_computer_notation_for_position(line["move"][0:2])
+        final_position = Engine.get_computer_notation_for_position(line["move"][2:4])
+        start_point = pg.Vector2((start_position[1] + 0.5) * SQUARE_SIZE, (start_position[0] + 0.5) * SQUARE_SIZE)
+        final_point = pg.Vector2((final_position[1] + 0.5) * SQUARE_SIZE, (final_position[0] + 0.5) * SQUARE_SIZE)
+        direction = (final_point - start_point).normalize()
+        normal = pg.Vector2(-direction.y, direction.x)
+        head_base = final_point - direction * SQUARE_SIZE * 0.3
+        pg.draw.line(screen, pg.Color(color), start_point, head_base, max(1, SQUARE_SIZE // 10))
+        pg.draw.polygon(screen, pg.Color(color), [final_point, head_base + normal * SQUARE_SIZE * 0.15,
+                                                  head_base - normal * SQUARE_SIZE * 0.15])
+
+
+def get_text_surfaces(text):
+    """
+    Function that returns the rendered surfaces of a given text, rendering them only the first time.
+    :param text: A string representing the text to be drawn.
+    :return: A (text surface, shadow surface, location) tuple.
+    """
+    if text not in TEXTS:
+        if "banner" not in FONTS:
+            FONTS["banner"] = pg.font.SysFont("Helvitca", 32, True, False)
+        font = FONTS["banner"]
+        text_object = font.render(text, False, pg.Color("turquoise"))
+        text_location = text_object.get_rect(center=(WIDTH // 2, HEIGHT // 2))
+        TEXTS[text] = (text_object, font.render(text, False, pg.Color("dark blue")), text_location)
+    return TEXTS[text]
 
 
 def draw_text(screen, text):
@@ -86,39 +207,90 @@ def draw_text(screen, text):
     Function that draws a given text of the board.
     :param screen: A Pygame Display.
     :param text: A string representing the text to be drawn.
-    :return:
+    :return: A Pygame Rect representing the area that was drawn.
     """
-    font = pg.font.SysFont("Helvitca", 32, True, False)
-    text_object = font.render(text, False, pg.Color("turquoise"))
-    text_location = pg.Rect(0, 0, WIDTH, HEIGHT) \
-        .move(WIDTH / 2 - text_object.get_width() / 2, HEIGHT / 2 - text_object.get_height() / 2)
+    text_object, shadow_object, text_location = get_text_surfaces(text)
     screen.blit(text_object, text_location)
-    text_object = font.render(text, False, pg.Color("dark blue"))
-    screen.blit(text_object, text_location.move(1, 1))
+    shadow_location = text_location.move(1, 1)
+    screen.blit(shadow_object, shadow_location)
+    return text_location.union(shadow_location)
+
+
+def get_game_over_text(game_state):
+    """
+    Function that returns the text announcing the end of the game.
+    :param game_state: A GameState object.
+    :return: A string representing the text to be drawn or None if the game is not over.
+    """
+    if game_state.check_mate:
+        return "Black wins by checkmate!" if game_state.white_to_move else "White wins by checkmate!"
+    if game_state.stale_mate:
+        return "Stalemate!"
+    return None
 
 
 def main(computer=False):
     """
     Main function (entry point) of the program. It handles the user inputs and calls the computer to generate a move if
-    needed.
+    needed. Only the squares that changed are redrawn and, while nothing happens, the loop sleeps waiting for events.
+    Positions are analysed in the background and pressing H shows the best moves found so far.
     :param computer: A boolean flag that says if computer move generator must pe called.
     :return: nothing
     """
-    pg.init()
+    init_pygame()
     screen = pg.display.set_mode((WIDTH, HEIGHT))
     screen.fill(pg.Color("white"))
     clock = pg.time.Clock()
     game_state = Engine.GameState()
     init_images()
+    init_surfaces()
     selected_square = ()  # Tuple used to record the position a player clicked (row, column). Starts empty.
     player_move = []  # List of two tuples that represent the starting square and the final square of a move.
-    valid_positions = []
+    valid_moves = game_state.get_valid_moves()  # Only recomputed when the game state changes.
+    drawn_square_contents = None  # The square contents on the screen. None forces a full redraw.
+    drawn_text = None  # The text on the screen.
+    analyser = Analysis.HintAnalyser(HINT_LINES, HINT_MAX_DEPTH)
+    show_hints = False
+    drawn_hints = None  # The hints on the screen.
     running = True
     game_over = False
     while running:
-        for event in pg.event.get():
+        valid_positions = []
+        if selected_square != ():
+            for valid_moves_index in range(len(valid_moves) - 1, -1, -1):
+                if valid_moves[valid_moves_index][0] == selected_square:
+                    valid_positions.append(valid_moves[valid_moves_index][1])
+        square_contents = get_square_contents(game_state, valid_positions, selected_square)
+        text = get_game_over_text(game_state)
+        game_over = text is not None
+        analysing = analyser.update(game_state)
+        hints = analyser.get_hints(game_state) if show_hints else None
+        if text != drawn_text or hints != drawn_hints:  # they cover several squares, so all of them are redrawn
+            drawn_square_contents = None
+        elif hints is not None and square_contents != drawn_square_contents:
+            drawn_square_contents = None
+        dirty_rects = draw_state(screen, square_contents, drawn_square_contents)
+        if hints is not None and drawn_square_contents is None:
+            draw_hints(screen, hints)
+        if text is not None and len(dirty_rects) != 0:
+            dirty_rects.append(draw_text(screen, text))
+        if drawn_square_contents is None:
+            pg.display.flip()
+        elif len(dirty_rects) != 0:
+            pg.display.update(dirty_rects)
+        drawn_square_contents = square_contents
+        drawn_text = text
+        drawn_hints = hints
+        clock.tick(MAX_FPS)
+
+        state_changed = False
+        # sleep until there is at least one event, waking up regularly while an analysis is running
+        first_event = pg.event.wait(HINT_POLL_INTERVAL) if analysing else pg.event.wait()
+        for event in [first_event] + pg.event.get():
             if event.type == pg.QUIT:
                 running = False
+            elif event.type in (pg.VIDEOEXPOSE, pg.WINDOWEXPOSED):
+                drawn_square_contents = None
             elif event.type == pg.MOUSEBUTTONDOWN:
                 if not game_over:
                     location = pg.mouse.get_pos()  # [X, Y] coordinates of a mouse click in the game window.
@@ -131,7 +303,7 @@ def main(computer=False):
                         selected_square = (row, col)
                         player_move.append(selected_square)
                     if len(player_move) == 2:  # the player has clicked to different squares and thus picked a move
-                        if game_state.check_valid_move(player_move):
+                        if player_move in valid_moves:
                             game_state.register_move(player_move)
                         selected_square = ()  # reset the selected_square tuple
                         player_move = []  # reset the player_move list
@@ -140,34 +312,23 @@ def main(computer=False):
                             game_state.promote(promotion.upper())
                         if computer:
                             game_state.make_computer_move()
+                        state_changed = True
             elif event.type == pg.KEYDOWN:
+                if event.key == pg.K_h:
+                    show_hints = not show_hints
                 if event.key == pg.K_z:
                     game_state.undo_move()
                     game_over = False
+                    state_changed = True
                 if event.key == pg.K_x:
                     game_state = Engine.GameState()
                     selected_square = ()
                     player_move = []
                     game_over = False
-        if selected_square != ():
+                    state_changed = True
+        if state_changed:
             valid_moves = game_state.get_valid_moves()
-            for valid_moves_index in range(len(valid_moves) - 1, -1, -1):
-                if valid_moves[valid_moves_index][0] == selected_square:
-                    valid_positions.append(valid_moves[valid_moves_index][1])
-        draw_state(screen, game_state, valid_positions, selected_square)
-
-        if game_state.check_mate:
-            game_over = True
-            if game_state.white_to_move:
-                draw_text(screen, "Black wins by checkmate!")
-            else:
-                draw_text(screen, "White wins by checkmate!")
-        elif game_state.stale_mate:
-            game_over = True
-            draw_text(screen, "Stalemate!")
-        valid_positions = []
-        clock.tick(MAX_FPS)
-        pg.display.flip()
+    analyser.close()
 
 
 if __name__ == "__main__":
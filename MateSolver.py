@@ -0,0 +1,292 @@
+"""
+This file contains the mate solver: it proves or disproves that the player to move can force a checkmate in a given
+number of moves, using proof-number search. It is used to verify batches of mate puzzles.
+"""
+# imports
+import argparse
+import copy
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import Engine
+import Search
+
+
+class ProofNode:
+    """
+    This class is used to represent a position of the proof-number search tree. In OR nodes the attacker is to move and
+    one mating move is enough, in AND nodes the defender is to move and every reply must lead to a mate.
+    """
+
+    def __init__(self, move, or_node, remaining_moves):
+        """
+        Constructor of ProofNode class.
+        :param move: The move leading to the node from its parent, in computer notation, or None for the root.
+        :param or_node: True if the attacker is to move, False otherwise.
+        :param remaining_moves: The number of moves the attacker can still make.
+        :return: A ProofNode object.
+        """
+        self.move = move
+        self.or_node = or_node
+        self.remaining_moves = remaining_moves
+        self.proof = 1  # Number of nodes to prove to show that the attacker mates.
+        self.disproof = 1  # Number of nodes to prove to show that the defender escapes.
+        self.children = None  # Only set once the node is expanded.
+
+    def update(self):
+        """
+        Function that recomputes the proof and disproof numbers of an expanded node from those of its children.
+        :return: True if any of the numbers changed, False otherwise.
+        """
+        if self.or_node:
+            proof = min((child.proof for child in self.children), default=math.inf)
+            disproof = sum(child.disproof for child in self.children)
+        else:
+            proof = sum(child.proof for child in self.children)
+            disproof = min((child.disproof for child in self.children), default=math.inf)
+        changed = proof != self.proof or disproof != self.disproof
+        self.proof = proof
+        self.disproof = disproof
+        return changed
+
+    def set_proven(self):
+        """
+        Function that marks the node as a forced mate.
+        :return: nothing
+        """
+        self.proof = 0
+        self.disproof = math.inf
+
+    def set_disproven(self):
+        """
+        Function that marks the node as a position where the defender escapes.
+        :return: nothing
+        """
+        self.proof = math.inf
+        self.disproof = 0
+
+
+class MateSolver:
+    """
+    This class is used to solve a mate in N problem on a GameState object. The search tree is bounded by a maximum
+    number of nodes and a time limit; when one of them is reached the problem is left unsolved.
+    """
+
+    def __init__(self, game_state, mate_in, max_nodes=200000, time_limit=None):
+        """
+        Constructor of MateSolver class.
+        :param game_state: A GameState object. It is copied, the given object is not modified.
+        :param mate_in: The number of moves the player to move has to deliver checkmate.
+        :param max_nodes: The maximum number of nodes of the search tree.
+        :param time_limit: The maximum number of seconds the search can take or None for no limit.
+        :return: A MateSolver object.
+        """
+        self.game_state = copy.deepcopy(game_state)
+        self.root = ProofNode(None, True, mate_in)
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.nodes = 1
+
+    def evaluate(self, node):
+        """
+        Function that sets the initial proof and disproof numbers of a new node, from the position it represents.
+        Terminal nodes are proven or disproven, the others favour the nodes where the defender has few replies.
+        :param node: A ProofNode object. The GameState object must be in the position of the node.
+        :return: nothing
+        """
+        moves = self.game_state.get_valid_moves()
+        if node.or_node:
+            if len(moves) == 0:  # the attacker is mated or stalemated
+                node.set_disproven()
+            else:
+                node.proof = 1
+                node.disproof = len(moves)
+        elif len(moves) == 0:
+            if self.game_state.check_mate:
+                node.set_proven()
+            else:
+                node.set_disproven()
+        elif node.remaining_moves == 0:
+            node.set_disproven()
+        else:
+            node.proof = len(moves)
+            node.disproof = 1
+
+    def expand(self, node):
+        """
+        Function that creates and evaluates the children of a node. The moves of the attacker are generated checks
+        first and, on its last move, only checks are generated since no other move can mate.
+        :param node: A ProofNode object. The GameState object must be in the position of the node.
+        :return: nothing
+        """
+        moves = self.game_state.get_valid_moves()
+        node.children = []
+        if node.or_node:
+            checks = []
+            quiet_moves = []
+            for move in moves:
+                en_passant_possible = Search.make_move(self.game_state, move)
+                if self.game_state.in_check():
+                    checks.append(move)
+                elif node.remaining_moves > 1:
+                    quiet_moves.append(move)
+                Search.unmake_move(self.game_state, en_passant_possible)
+            moves = checks + quiet_moves
+        remaining_moves = node.remaining_moves - 1 if node.or_node else node.remaining_moves
+        for move in moves:
+            child = ProofNode(move, not node.or_node, remaining_moves)
+            en_passant_possible = Search.make_move(self.game_state, move)
+            self.evaluate(child)
+            Search.unmake_move(self.game_state, en_passant_possible)
+            node.children.append(child)
+            self.nodes += 1
+            if node.or_node and child.proof == 0 or not node.or_node and child.disproof == 0:
+                break  # the node is solved, the remaining moves are not needed
+        node.update()
+
+    def solve(self):
+        """
+        Function that runs the proof-number search until the root is proven or disproven, or until the node or time
+        limit is reached.
+        :return: A dictionary object of this form
+        {"status": "mate", "line": ["A1A6", "B7A6", "B6B7"], "nodes": 1520, "time": 0.8}
+        where "status" is "mate" if a mate was found, "no_mate" if it was proven that there is no mate in the given
+        number of moves and "unknown" if a limit was reached. Promotions are searched as promotions to a Queen.
+        """
+        start_time = time.perf_counter()
+        self.evaluate(self.root)
+        while self.root.proof != 0 and self.root.disproof != 0:
+            if self.nodes >= self.max_nodes:
+                break
+            if self.time_limit is not None and time.perf_counter() - start_time > self.time_limit:
+                break
+            path = [self.root]
+            played = []
+            node = self.root
+            while node.children is not None:  # descend to the most proving node
+                if node.or_node:
+                    node = min(node.children, key=lambda child: child.proof)
+                else:
+                    node = min(node.children, key=lambda child: child.disproof)
+                played.append(Search.make_move(self.game_state, node.move))
+                path.append(node)
+            self.expand(node)
+            for ancestor in reversed(path[:-1]):
+                if not ancestor.update():
+                    break
+            for en_passant_possible in reversed(played):
+                Search.unmake_move(self.game_state, en_passant_possible)
+        if self.root.proof == 0:
+            status = "mate"
+        elif self.root.disproof == 0:
+            status = "no_mate"
+        else:
+            status = "unknown"
+        return {
+            "status": status,
+            "line": Search.get_notation_for_line(get_mating_line(self.root)) if status == "mate" else [],
+            "nodes": self.nodes,
+            "time": time.perf_counter() - start_time
+        }
+
+
+def get_proof_length(node):
+    """
+    Function that returns the number of plies of the longest defence in a proven subtree.
+    :param node: A proven ProofNode object.
+    :return: An integer representing the number of plies until checkmate.
+    """
+    if node.children is None or len(node.children) == 0:
+        return 0
+    if node.or_node:
+        return 1 + min(get_proof_length(child) for child in node.children if child.proof == 0)
+    return 1 + max(get_proof_length(child) for child in node.children)
+
+
+def get_mating_line(root):
+    """
+    Function that returns the main line of a proven tree: the fastest mate for the attacker against the longest
+    defence.
+    :param root: A proven ProofNode object.
+    :return: A list of moves in computer notation.
+    """
+    line = []
+    node = root
+    while node.children is not None and len(node.children) != 0:
+        if node.or_node:
+            node = min((child for child in node.children if child.proof == 0), key=get_proof_length)
+        else:
+            node = max(node.children, key=get_proof_length)
+        line.append(node.move)
+    return line
+
+
+def solve_puzzle(fen, mate_in, max_nodes=200000, time_limit=None):
+    """
+    Function that solves a mate puzzle given in FEN. It is run by the worker processes in batch mode.
+    :param fen: The position, in FEN.
+    :param mate_in: The number of moves the player to move has to deliver checkmate.
+    :param max_nodes: The maximum number of nodes of the search tree.
+    :param time_limit: The maximum number of seconds the search can take or None for no limit.
+    :return: A dictionary object, as returned by MateSolver.solve, with the "fen" and "mate_in" of the puzzle.
+    """
+    result = MateSolver(Engine.get_game_state_from_fen(fen), mate_in, max_nodes, time_limit).solve()
+    result["fen"] = fen
+    result["mate_in"] = mate_in
+    return result
+
+
+def solve_puzzles(puzzles, max_nodes=200000, time_limit=None, workers=None):
+    """
+    Generator that solves mate puzzles in a process pool and yields the results in the order of the puzzles.
+    :param puzzles: A list of (FEN, mate_in) tuples.
+    :param max_nodes: The maximum number of nodes of the search tree of each puzzle.
+    :param time_limit: The maximum number of seconds to search each puzzle or None for no limit.
+    :param workers: The number of worker processes or None to use one per CPU.
+    :return: A generator of dictionaries, as returned by solve_puzzle.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(solve_puzzle, fen, mate_in, max_nodes, time_limit) for fen, mate_in in puzzles]
+        for future in futures:
+            yield future.result()
+
+
+def read_puzzles(path):
+    """
+    Function that reads mate puzzles from a file with one "FEN; N" line per puzzle. Empty lines and lines starting with
+    "#" are ignored.
+    :param path: The path of the file.
+    :return: A list of (FEN, mate_in) tuples.
+    """
+    puzzles = []
+    with open(path) as puzzles_file:
+        for line in puzzles_file:
+            line = line.strip()
+            if line != "" and not line.startswith("#"):
+                fen, mate_in = line.rsplit(";", 1)
+                puzzles.append((fen.strip(), int(mate_in)))
+    return puzzles
+
+
+def main():
+    """
+    Main function of the mate solver. It prints one JSON result per puzzle and a summary.
+    :return: nothing
+    """
+    parser = argparse.ArgumentParser(description="Verify mate in N puzzles.")
+    parser.add_argument("puzzles", help="file with one 'FEN; N' line per puzzle")
+    parser.add_argument("--nodes", type=int, default=200000, help="maximum search tree nodes per puzzle")
+    parser.add_argument("--time", type=float, default=None, help="maximum search time per puzzle, in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    arguments = parser.parse_args()
+    statuses = {"mate": 0, "no_mate": 0, "unknown": 0}
+    for result in solve_puzzles(read_puzzles(arguments.puzzles), arguments.nodes, arguments.time, arguments.workers):
+        statuses[result["status"]] += 1
+        print(json.dumps(result))
+    print(json.dumps(statuses))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+This file contains the move search used to evaluate positions and to pick the best move for the computer.
+"""
+# imports
+import copy
+import time
+
+from Engine import get_chess_notation_for_move
+from utils import PIECE_VALUES, CHECKMATE_SCORE, DEFAULT_PROMOTION, EMPTY_SQUARE
+
+
+class SearchLimitReached(Exception):
+    """
+    Exception raised inside a search when its time or node budget is exhausted.
+    """
+
+
+class SearchContext:
+    """
+    This class is used to keep track of the budget of a search: the time it started, the number of visited nodes and
+    the limits it must respect.
+    """
+
+    def __init__(self, time_limit=None, node_limit=None):
+        """
+        Constructor of SearchContext class.
+        :param time_limit: The maximum number of seconds the search can take or None for no limit.
+        :param node_limit: The maximum number of nodes the search can visit or None for no limit.
+        :return: A SearchContext object.
+        """
+        self.start_time = time.perf_counter()
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.nodes = 0
+
+    def count_node(self):
+        """
+        Function that registers a visited node and stops the search if its budget is exhausted.
+        :return: nothing
+        """
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchLimitReached()
+        if self.time_limit is not None and self.get_elapsed_time() > self.time_limit:
+            raise SearchLimitReached()
+
+    def get_elapsed_time(self):
+        """
+        Function that returns the number of seconds passed since the search started.
+        :return: A float representing the elapsed time in seconds.
+        """
+        return time.perf_counter() - self.start_time
+
+
+def make_move(game_state, move):
+    """
+    Function that registers a move during a search. Pawns reaching the last rank are promoted to DEFAULT_PROMOTION.
+    :param game_state: A GameState object.
+    :param move: List of two tuples that represent the start and final board coordinates of a move.
+    :return: The En Passant square before the move, needed by unmake_move.
+    """
+    en_passant_possible = game_state.en_passant_possible
+    game_state.register_move(move)
+    if game_state.pawn_promotion:
+        game_state.promote(DEFAULT_PROMOTION)
+    return en_passant_possible
+
+
+def unmake_move(game_state, en_passant_possible):
+    """
+    Function that undoes a move registered by make_move.
+    :param game_state: A GameState object.
+    :param en_passant_possible: The En Passant square returned by make_move.
+    :return: nothing
+    """
+    game_state.undo_move()
+    game_state.en_passant_possible = en_passant_possible
+
+
+def evaluate(game_state):
+    """
+    Function that evaluates a position by counting the material of both players.
+    :param game_state: A GameState object.
+    :return: An integer representing the score in centipawns, from the perspective of the player to move.
+    """
+    score = 0
+    for row in game_state.board:
+        for piece in row:
+            if piece != EMPTY_SQUARE:
+                score += PIECE_VALUES[piece[1]] if piece[0] == "w" else -PIECE_VALUES[piece[1]]
+    return score if game_state.white_to_move else -score
+
+
+def order_moves(game_state, moves, first_move=None):
+    """
+    Function that sorts moves so that the most promising ones are searched first: the given first move, then captures
+    of valuable pieces by cheap pieces, then quiet moves.
+    :param game_state: A GameState object.
+    :param moves: A list of moves in computer notation.
+    :param first_move: A move to be searched before all the others or None.
+    :return: nothing
+    """
+    def move_priority(move):
+        if move == first_move:
+            return -CHECKMATE_SCORE
+        captured_piece = game_state.board[move[1][0]][move[1][1]]
+        if captured_piece == EMPTY_SQUARE:
+            return 0
+        moved_piece = game_state.board[move[0][0]][move[0][1]]
+        return PIECE_VALUES[moved_piece[1]] - 10 * PIECE_VALUES[captured_piece[1]]
+    moves.sort(key=move_priority)
+
+
+def negamax(game_state, depth, alpha, beta, ply, context):
+    """
+    Function that searches a position with the alpha-beta algorithm in its negamax form.
+    :param game_state: A GameState object.
+    :param depth: The remaining number of plies to search.
+    :param alpha: The lower bound of the search window.
+    :param beta: The upper bound of the search window.
+    :param ply: The distance from the root of the search, in plies.
+    :param context: A SearchContext object.
+    :return: A (score, principal variation) tuple. The score is from the perspective of the player to move.
+    """
+    context.count_node()
+    if depth == 0:
+        return evaluate(game_state), []
+    moves = game_state.get_valid_moves()
+    if len(moves) == 0:
+        return (ply - CHECKMATE_SCORE if game_state.check_mate else 0), []
+    order_moves(game_state, moves)
+    best_line = []
+    for move in moves:
+        en_passant_possible = make_move(game_state, move)
+        score, line = negamax(game_state, depth - 1, -beta, -alpha, ply + 1, context)
+        score = -score
+        unmake_move(game_state, en_passant_possible)
+        if score > alpha:
+            alpha = score
+            best_line = [move] + line
+            if alpha >= beta:
+                break
+    return alpha, best_line
+
+
+def search(game_state, max_depth=3, time_limit=None, node_limit=None):
+    """
+    Function that searches for the best move with iterative deepening, stopping when max_depth is reached or when the
+    time or node budget is exhausted. The given GameState object is not modified.
+    :param game_state: A GameState object.
+    :param max_depth: The maximum number of plies to search.
+    :param time_limit: The maximum number of seconds the search can take or None for no limit.
+    :param node_limit: The maximum number of nodes the search can visit or None for no limit.
+    :return: A dictionary object of this form
+    {"best_move": [(6, 4), (4, 4)], "score": 0, "depth": 3, "nodes": 1024, "time": 1.5, "pv": [[(6, 4), (4, 4)], ...],
+    "iterations": [{"depth": 1, "best_move": [(6, 4), (4, 4)], "score": 0, "nodes": 21, "time": 0.01}, ...]}
+    The score is from the perspective of the player to move and "best_move" is None if there are no valid moves.
+    "iterations" holds the result of every depth searched completely, with the nodes and time spent until then.
+    """
+    game_state = copy.deepcopy(game_state)
+    context = SearchContext(time_limit, node_limit)
+    moves = game_state.get_valid_moves()
+    result = {
+        "best_move": None,
+        "score": (-CHECKMATE_SCORE if game_state.check_mate else 0) if len(moves) == 0 else evaluate(game_state),
+        "depth": 0,
+        "nodes": 0,
+        "time": 0.0,
+        "pv": [],
+        "iterations": []
+    }
+    if len(moves) != 0:
+        order_moves(game_state, moves)
+        result["best_move"] = moves[0]
+        result["pv"] = [moves[0]]
+        for depth in range(1, max_depth + 1):
+            order_moves(game_state, moves, result["best_move"])
+            try:
+                score, line = root_search(game_state, moves, depth, context)
+            except SearchLimitReached:
+                break
+            result["best_move"] = line[0]
+            result["score"] = score
+            result["depth"] = depth
+            result["pv"] = line
+            result["iterations"].append({"depth": depth, "best_move": line[0], "score": score, "nodes": context.nodes,
+                                         "time": context.get_elapsed_time()})
+            if abs(score) >= CHECKMATE_SCORE - max_depth:  # a forced mate was found, searching deeper is useless
+                break
+    result["nodes"] = context.nodes
+    result["time"] = context.get_elapsed_time()
+    return result
+
+
+def root_search(game_state, moves, depth, context):
+    """
+    Function that searches all the moves of the root position to a given depth.
+    :param game_state: A GameState object.
+    :param moves: The valid moves of the root position, in the order they are to be searched.
+    :param depth: The number of plies to search.
+    :param context: A SearchContext object.
+    :return: A (score, principal variation) tuple. The score is from the perspective of the player to move.
+    """
+    alpha = -CHECKMATE_SCORE - 1
+    best_line = []
+    for move in moves:
+        en_passant_possible = make_move(game_state, move)
+        score, line = negamax(game_state, depth - 1, -CHECKMATE_SCORE - 1, -alpha, 1, context)
+        score = -score
+        unmake_move(game_state, en_passant_possible)
+        if score > alpha:
+            alpha = score
+            best_line = [move] + line
+    return alpha, best_line
+
+
+def score_move(game_state, move, depth):
+    """
+    Function that searches a single move of a position to a given depth with a full window, so that its score can be
+    compared with the score of a search of the same position and depth. The given GameState object is not modified.
+    :param game_state: A GameState object.
+    :param move: A valid move in computer notation.
+    :param depth: The number of plies to search, counting the move itself.
+    :return: An integer representing the score of the move, from the perspective of the player to move.
+    """
+    game_state = copy.deepcopy(game_state)
+    make_move(game_state, move)
+    score, _ = negamax(game_state, depth - 1, -CHECKMATE_SCORE - 1, CHECKMATE_SCORE + 1, 1, SearchContext())
+    return -score
+
+
+def search_multi_pv(game_state, pv_count=3, max_depth=3, time_limit=None, node_limit=None):
+    """
+    Function that searches for the pv_count best moves with iterative deepening, stopping when max_depth is reached or
+    when the time or node budget is exhausted. The given GameState object is not modified.
+    :param game_state: A GameState object.
+    :param pv_count: The number of best moves to return.
+    :param max_depth: The maximum number of plies to search.
+    :param time_limit: The maximum number of seconds the search can take or None for no limit.
+    :param node_limit: The maximum number of nodes the search can visit or None for no limit.
+    :return: A dictionary object of this form
+    {"lines": [{"move": [(6, 4), (4, 4)], "score": 0, "pv": [[(6, 4), (4, 4)], ...]}, ...], "depth": 3,
+    "nodes": 1024, "time": 1.5}
+    The lines are sorted from the best move, their scores are from the perspective of the player to move and they are
+    those of the last depth searched completely.
+    """
+    game_state = copy.deepcopy(game_state)
+    context = SearchContext(time_limit, node_limit)
+    moves = game_state.get_valid_moves()
+    order_moves(game_state, moves)
+    result = {"lines": [], "depth": 0, "nodes": 0, "time": 0.0}
+    for depth in range(1, max_depth + 1):
+        try:
+            lines = multi_pv_root_search(game_state, moves, pv_count, depth, context)
+        except SearchLimitReached:
+            break
+        result["lines"] = lines
+        result["depth"] = depth
+        best_moves = [line["move"] for line in lines]
+        moves.sort(key=lambda move: best_moves.index(move) if move in best_moves else len(best_moves))
+    result["nodes"] = context.nodes
+    result["time"] = context.get_elapsed_time()
+    return result
+
+
+def multi_pv_root_search(game_state, moves, pv_count, depth, context):
+    """
+    Function that searches all the moves of the root position to a given depth and keeps the pv_count best ones. A move
+    is searched with a window starting from the score of the current pv_count-th best move, so only the scores of the
+    kept moves are exact.
+    :param game_state: A GameState object.
+    :param moves: The valid moves of the root position, in the order they are to be searched.
+    :param pv_count: The number of best moves to keep.
+    :param depth: The number of plies to search.
+    :param context: A SearchContext object.
+    :return: A list of at most pv_count dictionaries of this form, sorted from the best move
+    {"move": [(6, 4), (4, 4)], "score": 0, "pv": [[(6, 4), (4, 4)], ...]}
+    """
+    lines = []
+    for move in moves:
+        alpha = lines[-1]["score"] if len(lines) == pv_count else -CHECKMATE_SCORE - 1
+        en_passant_possible = make_move(game_state, move)
+        score, line = negamax(game_state, depth - 1, -CHECKMATE_SCORE - 1, -alpha, 1, context)
+        score = -score
+        unmake_move(game_state, en_passant_possible)
+        if score > alpha:
+            lines.append({"move": move, "score": score, "pv": [move] + line})
+            lines.sort(key=lambda kept_line: -kept_line["score"])
+            del lines[pv_count:]
+    return lines
+
+
+def get_notation_for_line(line):
+    """
+    Function that returns the chess notation for a list of moves.
+    :param line: A list of moves in computer notation.
+    :return: A list of strings representing the moves in chess notation: ["E2E4", "E7E5"]
+    """
+    return [get_chess_notation_for_move(move) for move in line]
@@ -0,0 +1,525 @@
+"""
+This file contains the game server: one asyncio process hosting many game sessions, each one holding a GameState.
+Clients send one JSON request per line and receive one JSON response per line. Computer thinking runs in a bounded
+process pool so that the event loop never blocks on a search.
+"""
+# imports
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import Analysis
+import Engine
+
+from utils import PROMOTION_PIECES
+
+
+class RequestError(Exception):
+    """
+    Exception raised by a request handler when a request cannot be served. Its message is sent to the client.
+    """
+
+
+def get_search_limit(request, name, converter, default):
+    """
+    Function that reads a search limit of a "think" request.
+    :param request: A dictionary object holding the request: {"op": "think", "session": "1", "depth": 3}
+    :param name: The name of the limit: "depth", "time" or "nodes".
+    :param converter: The type the limit is converted to: int or float.
+    :param default: The value used when the request does not set the limit.
+    :return: A positive number of the given type or None if the limit is not set and has no default.
+    """
+    value = request.get(name)
+    if value is None:
+        return default
+    try:
+        if isinstance(value, bool):
+            raise ValueError()
+        value = converter(value)
+    except (TypeError, ValueError, OverflowError):
+        raise RequestError("Invalid " + name)
+    if not value > 0:
+        raise RequestError("Invalid " + name)
+    return value
+
+
+class Session:
+    """
+    This class is used to represent a game session: its GameState, its moves log and its latency statistics. An idle
+    session can be compacted to its moves log and is rebuilt when it is used again.
+    """
+
+    def __init__(self, session_id):
+        """
+        Constructor of Session class.
+        :param session_id: A string identifying the session.
+        :return: A Session object.
+        """
+        self.session_id = session_id
+        self.game_state = Engine.GameState()
+        self.moves_log = None  # Only set while the session is compacted.
+        self.last_used = time.monotonic()
+        self.requests = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def get_game_state(self):
+        """
+        Function that returns the GameState of the session, rebuilding it if the session was compacted.
+        :return: A GameState object.
+        """
+        if self.game_state is None:
+            self.game_state = Engine.GameState()
+            for logged_move in self.moves_log:
+                Analysis.register_logged_move(self.game_state, logged_move)
+            self.moves_log = None
+        return self.game_state
+
+    def compact(self):
+        """
+        Function that drops the GameState of the session and only keeps its moves log.
+        :return: nothing
+        """
+        if self.game_state is not None and not self.game_state.await_promotion:
+            self.moves_log = self.game_state.moves_log
+            self.game_state = None
+
+    def is_compacted(self):
+        """
+        Function that tells if the session is compacted.
+        :return: True if the session only holds its moves log, False otherwise.
+        """
+        return self.game_state is None
+
+    def record_latency(self, latency):
+        """
+        Function that registers the latency of a request served for the session.
+        :param latency: The time it took to serve the request, in seconds.
+        :return: nothing
+        """
+        self.requests += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def get_metrics(self):
+        """
+        Function that returns the latency statistics of the session.
+        :return: A dictionary object of this form
+        {"requests": 12, "mean_latency_ms": 0.8, "max_latency_ms": 35.2, "compacted": False}
+        """
+        return {
+            "requests": self.requests,
+            "mean_latency_ms": 1000 * self.total_latency / self.requests if self.requests != 0 else 0.0,
+            "max_latency_ms": 1000 * self.max_latency,
+            "compacted": self.is_compacted()
+        }
+
+
+class GameServer:
+    """
+    This class is used to serve requests on game sessions. Sessions are kept in least recently used order: past
+    max_active_sessions the least recently used ones are compacted and past max_sessions, or after idle_timeout
+    seconds without requests, they are evicted.
+    """
+
+    def __init__(self, workers=None, max_pending_searches=64, max_active_sessions=1000, max_sessions=100000,
+                 idle_timeout=3600.0):
+        """
+        Constructor of GameServer class.
+        :param workers: The number of search processes or None to use one per CPU.
+        :param max_pending_searches: The maximum number of searches submitted to the process pool at the same time.
+        Further "think" requests wait for a free slot.
+        :param max_active_sessions: The maximum number of sessions holding a GameState.
+        :param max_sessions: The maximum number of sessions.
+        :param idle_timeout: The number of seconds after which a session without requests is evicted.
+        :return: A GameServer object.
+        """
+        # Spawned workers do not inherit the sockets of the connected clients, which forked workers would keep open.
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.workers = workers
+        self.max_pending_searches = max_pending_searches
+        self.search_slots = None  # Created in the event loop, by the first "think" request.
+        self.eviction_task = None
+        self.max_active_sessions = max_active_sessions
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()
+        self.active_sessions = OrderedDict()  # Sessions holding a GameState, also in least recently used order.
+        self.session_ids = itertools.count(1)
+        self.start_time = time.monotonic()
+        self.requests = 0
+        self.pending_searches = 0
+        self.compactions = 0
+        self.evictions = 0
+        self.operations = {
+            "new": self.new_session,
+            "close": self.close_session,
+            "move": self.move,
+            "promote": self.promote,
+            "undo": self.undo,
+            "legal_moves": self.legal_moves,
+            "think": self.think,
+            "metrics": self.metrics
+        }
+
+    def get_session(self, request):
+        """
+        Function that returns the session a request refers to and marks it as the most recently used.
+        :param request: A dictionary object holding the request.
+        :return: A Session object.
+        """
+        session_id = request.get("session")
+        if not isinstance(session_id, str):
+            raise RequestError("Invalid request")
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise RequestError("Unknown session")
+        self.sessions.move_to_end(session.session_id)
+        session.last_used = time.monotonic()
+        session.get_game_state()
+        self.active_sessions[session.session_id] = session
+        self.active_sessions.move_to_end(session.session_id)
+        self.enforce_limits()
+        return session
+
+    def enforce_limits(self):
+        """
+        Function that evicts the least recently used sessions past max_sessions and compacts them past
+        max_active_sessions.
+        :return: nothing
+        """
+        while len(self.sessions) > self.max_sessions:
+            self.remove_session(next(iter(self.sessions)))
+            self.evictions += 1
+        awaiting_promotion = []  # sessions that cannot be compacted, kept at the front of the active sessions
+        while len(self.active_sessions) + len(awaiting_promotion) > self.max_active_sessions \
+                and len(self.active_sessions) != 0:
+            _, session = self.active_sessions.popitem(last=False)
+            session.compact()
+            if session.is_compacted():
+                self.compactions += 1
+            else:
+                awaiting_promotion.append(session)
+        for session in reversed(awaiting_promotion):
+            self.active_sessions[session.session_id] = session
+            self.active_sessions.move_to_end(session.session_id, last=False)
+
+    def evict_idle_sessions(self):
+        """
+        Function that evicts the sessions without requests for more than idle_timeout seconds.
+        :return: nothing
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        while len(self.sessions) != 0:
+            session = next(iter(self.sessions.values()))
+            if session.last_used > deadline:
+                break
+            self.remove_session(session.session_id)
+            self.evictions += 1
+
+    def remove_session(self, session_id):
+        """
+        Function that removes a session.
+        :param session_id: A string identifying the session.
+        :return: nothing
+        """
+        self.sessions.pop(session_id)
+        self.active_sessions.pop(session_id, None)
+
+    def new_session(self, request):
+        """
+        Function that creates a session at the initial position.
+        :param request: A dictionary object holding the request: {"op": "new"}
+        :return: A dictionary object of this form {"session": "1"}
+        """
+        session = Session(str(next(self.session_ids)))
+        self.sessions[session.session_id] = session
+        self.active_sessions[session.session_id] = session
+        self.enforce_limits()
+        return {"session": session.session_id}
+
+    def close_session(self, request):
+        """
+        Function that removes a session.
+        :param request: A dictionary object holding the request: {"op": "close", "session": "1"}
+        :return: An empty dictionary object.
+        """
+        self.remove_session(self.get_session(request).session_id)
+        return {}
+
+    def move(self, request):
+        """
+        Function that registers a move. The promotion piece can be appended to the move: "E7E8Q". Otherwise a
+        "promote" request must follow a move that reaches the promotion rank.
+        :param request: A dictionary object holding the request: {"op": "move", "session": "1", "move": "E2E4"}
+        :return: A dictionary object, as returned by get_state.
+        """
+        game_state = self.get_session(request).get_game_state()
+        if game_state.await_promotion:
+            raise RequestError("Awaiting promotion")
+        try:
+            move = Engine.get_computer_notation_for_move(request["move"])
+        except (KeyError, TypeError, IndexError, AttributeError):
+            raise RequestError("Invalid move")
+        if not game_state.check_valid_move(move):
+            raise RequestError("Invalid move")
+        game_state.register_move(move)
+        if game_state.await_promotion and request["move"][4:].upper() in PROMOTION_PIECES:
+            game_state.promote(request["move"][4:].upper())
+        return self.get_state(game_state)
+
+    def promote(self, request):
+        """
+        Function that promotes the Pawn moved by the last move.
+        :param request: A dictionary object holding the request: {"op": "promote", "session": "1", "piece": "Q"}
+        :return: A dictionary object, as returned by get_state.
+        """
+        game_state = self.get_session(request).get_game_state()
+        if not game_state.await_promotion:
+            raise RequestError("No promotion awaited")
+        piece = str(request.get("piece", "")).upper()
+        if piece not in PROMOTION_PIECES:
+            raise RequestError("Invalid promotion piece")
+        game_state.promote(piece)
+        return self.get_state(game_state)
+
+    def undo(self, request):
+        """
+        Function that undoes the last move.
+        :param request: A dictionary object holding the request: {"op": "undo", "session": "1"}
+        :return: A dictionary object, as returned by get_state.
+        """
+        game_state = self.get_session(request).get_game_state()
+        game_state.undo_move()
+        game_state.await_promotion = False
+        return self.get_state(game_state)
+
+    def legal_moves(self, request):
+        """
+        Function that returns the valid moves of the player to move.
+        :param request: A dictionary object holding the request: {"op": "legal_moves", "session": "1"}
+        :return: A dictionary object of this form {"moves": ["E2E4", "D2D4", ...]}
+        """
+        game_state = self.get_session(request).get_game_state()
+        if game_state.await_promotion:
+            return {"moves": []}
+        return {"moves": [Engine.get_chess_notation_for_move(move) for move in game_state.get_valid_moves()]}
+
+    async def think(self, request):
+        """
+        Function that searches the position of a session in the process pool.
+        :param request: A dictionary object holding the request, with optional search limits:
+        {"op": "think", "session": "1", "depth": 3, "time": 2.0, "nodes": 10000}
+        :return: A dictionary object, as returned by Analysis.analyse_position.
+        """
+        game_state = self.get_session(request).get_game_state()
+        if game_state.await_promotion:
+            raise RequestError("Awaiting promotion")
+        limits = (get_search_limit(request, "depth", int, 3), get_search_limit(request, "time", float, None),
+                  get_search_limit(request, "nodes", int, None))
+        moves_log = list(game_state.moves_log)
+        if self.search_slots is None:
+            self.search_slots = asyncio.Semaphore(self.max_pending_searches)
+        async with self.search_slots:
+            self.pending_searches += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, Analysis.analyse_position, moves_log, *limits)
+            except BrokenProcessPool:
+                # A search process died: the pool cannot be used anymore and is replaced.
+                self.executor.shutdown(wait=False)
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+                raise RequestError("Search failed")
+            except Exception as error:
+                raise RequestError("Search failed: " + str(error))
+            finally:
+                self.pending_searches -= 1
+
+    def metrics(self, request):
+        """
+        Function that returns the server wide statistics and, if a session is given, the statistics of the session.
+        :param request: A dictionary object holding the request: {"op": "metrics", "session": "1"}
+        :return: A dictionary object, as returned by get_server_metrics, with an optional "session" entry as
+        returned by Session.get_metrics.
+        """
+        response = self.get_server_metrics()
+        if "session" in request:
+            response["session"] = self.get_session(request).get_metrics()
+        return response
+
+    def get_state(self, game_state):
+        """
+        Function that returns the part of a GameState sent to the clients after a change.
+        :param game_state: A GameState object.
+        :return: A dictionary object of this form
+        {"white_to_move": True, "await_promotion": False, "check_mate": False, "stale_mate": False, "moves": 12}
+        """
+        if not game_state.await_promotion:
+            game_state.get_valid_moves()  # updates the check_mate and stale_mate flags
+        return {
+            "white_to_move": game_state.white_to_move,
+            "await_promotion": game_state.await_promotion,
+            "check_mate": game_state.check_mate,
+            "stale_mate": game_state.stale_mate,
+            "moves": len(game_state.moves_log)
+        }
+
+    def get_server_metrics(self):
+        """
+        Function that returns the server wide statistics.
+        :return: A dictionary object of this form
+        {"uptime": 60.0, "requests": 1200, "throughput": 20.0, "sessions": 50, "active_sessions": 10,
+        "pending_searches": 2, "compactions": 40, "evictions": 0}
+        """
+        uptime = time.monotonic() - self.start_time
+        return {
+            "uptime": uptime,
+            "requests": self.requests,
+            "throughput": self.requests / uptime if uptime > 0 else 0.0,
+            "sessions": len(self.sessions),
+            "active_sessions": len(self.active_sessions),
+            "pending_searches": self.pending_searches,
+            "compactions": self.compactions,
+            "evictions": self.evictions
+        }
+
+    async def handle_request(self, request):
+        """
+        Function that serves a request and records its latency.
+        :param request: A dictionary object holding the request: {"op": "move", "session": "1", "move": "E2E4"}
+        :return: A dictionary object holding the response: {"ok": True, ...} or {"ok": False, "error": "..."}
+        """
+        start_time = time.perf_counter()
+        self.requests += 1
+        try:
+            if not isinstance(request.get("op"), str) or not isinstance(request.get("session", ""), str):
+                raise RequestError("Invalid request")
+            operation = self.operations.get(request["op"])
+            if operation is None:
+                raise RequestError("Unknown operation")
+            response = operation(request)
+            if asyncio.iscoroutine(response):
+                response = await response
+            response["ok"] = True
+        except RequestError as error:
+            response = {"ok": False, "error": str(error)}
+        except Exception as error:  # every request gets a response, even when serving it failed unexpectedly
+            response = {"ok": False, "error": "Internal error: " + repr(error)}
+        session = self.sessions.get(request["session"]) if isinstance(request.get("session"), str) else None
+        if session is not None:
+            session.record_latency(time.perf_counter() - start_time)
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def handle_client(self, reader, writer):
+        """
+        Function that serves the requests of a connected client, one JSON object per line. Requests of the same client
+        are served concurrently and responses carry the "id" of their request.
+        :param reader: An asyncio StreamReader.
+        :param writer: An asyncio StreamWriter.
+        :return: nothing
+        """
+        tasks = set()
+
+        async def respond(request):
+            response = await self.handle_request(request)
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError()
+                except ValueError:
+                    writer.write((json.dumps({"ok": False, "error": "Invalid request"}) + "\n").encode())
+                    continue
+                task = asyncio.ensure_future(respond(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if len(tasks) != 0:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def evict_idle_sessions_periodically(self, interval):
+        """
+        Function that evicts idle sessions every interval seconds, until it is cancelled.
+        :param interval: The number of seconds between evictions.
+        :return: nothing
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle_sessions()
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Function that starts listening for clients.
+        :param host: The address to listen on.
+        :param port: The port to listen on or 0 to pick a free one.
+        :return: An asyncio Server object. Its sockets tell the port that was picked.
+        """
+        server = await asyncio.start_server(self.handle_client, host, port)
+        self.eviction_task = asyncio.ensure_future(self.evict_idle_sessions_periodically(min(60.0, self.idle_timeout)))
+        return server
+
+    def close(self):
+        """
+        Function that stops the idle session eviction and the search processes.
+        :return: nothing
+        """
+        if self.eviction_task is not None:
+            self.eviction_task.cancel()
+        self.executor.shutdown(wait=False)
+
+
+async def serve(host, port, workers):
+    """
+    Function that runs a game server until it is cancelled.
+    :param host: The address to listen on.
+    :param port: The port to listen on.
+    :param workers: The number of search processes or None to use one per CPU.
+    :return: nothing
+    """
+    game_server = GameServer(workers)
+    server = await game_server.start(host, port)
+    print("Listening on %s:%d" % server.sockets[0].getsockname()[:2])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        game_server.close()
+
+
+def main():
+    """
+    Main function of the game server.
+    :return: nothing
+    """
+    parser = argparse.ArgumentParser(description="Host many chess games in one process.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=None, help="number of search processes")
+    arguments = parser.parse_args()
+    try:
+        asyncio.run(serve(arguments.host, arguments.port, arguments.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
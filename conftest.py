@@ -0,0 +1,3 @@
+"""
+This file makes the modules of the repository importable from the tests.
+"""
@@ -0,0 +1,25 @@
+"""
+In this file are stored constants and state used by the GUI. The engine does not depend on it.
+"""
+
+MAX_FPS = 15
+HEIGHT = WIDTH = 512  # Window size
+DIMENSION = 8  # Dimensions of a chess board (8x8)
+SQUARE_SIZE = HEIGHT // DIMENSION  # Size of a board square in the GUI
+PIECES_DIRECTORY = "pieces"  # Directory of the source piece images
+SPRITE_CACHE_DIRECTORY = ".sprite_cache"  # Directory of the pre-scaled sprite atlases
+IMAGES = {}
+SURFACES = {}  # Pre-rendered board and highlight surfaces
+FONTS = {}
+TEXTS = {}  # Rendered text surfaces, by text
+NO_HIGHLIGHT = ""
+SELECTED_HIGHLIGHT = "selected"  # Highlight of the selected square
+VALID_HIGHLIGHT = "valid"  # Highlight of the squares the selected piece can move to
+HINT_LINES = 3  # Number of best moves shown as hints
+HINT_MAX_DEPTH = 3  # Depth at which the background analysis of a position stops
+HINT_POLL_INTERVAL = 100  # Milliseconds between checks for finished background analysis
+HINT_COLORS = ["dark green", "olive drab", "dark khaki"]  # Arrow colors, from the best move
+PROMOTION_TEXT = "Press R to promote to Rook\n" \
+                 "Press Q to promote to Queen\n" \
+                 "Press B to promote to Bishop\n" \
+                 "Press N to promote to Knight"
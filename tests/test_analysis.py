@@ -0,0 +1,69 @@
+"""
+This file contains the tests of the post-game analysis.
+"""
+# imports
+from concurrent.futures import Future
+
+import Analysis
+import Engine
+
+
+def play_moves(moves):
+    """
+    Function that plays moves from the initial position, computing the valid moves before each one as the GUI does.
+    :param moves: A list of strings representing moves in chess notation, with an optional promotion piece: "B7A8N"
+    :return: A GameState object.
+    """
+    game_state = Engine.GameState()
+    for move in moves:
+        game_state.get_valid_moves()
+        game_state.register_move(Engine.get_computer_notation_for_move(move))
+        if len(move) == 5:
+            game_state.promote(move[4])
+    return game_state
+
+
+def test_replay_moves_log_rebuilds_promotions():
+    game_state = play_moves(["E2E4", "D7D5", "E4D5", "C7C6", "D5C6", "G8F6", "C6B7", "A7A6", "G1F3", "F6E4",
+                             "B7A8N"])
+    for replayed_game_state in Analysis.replay_moves_log(game_state.moves_log):
+        replayed_game_state.get_valid_moves()
+    assert replayed_game_state.board == game_state.board
+    assert replayed_game_state.board[0][0] == "wN"
+    assert replayed_game_state.board[5][5] == "wN"
+
+
+def test_analyse_game_searches_again_shallower_cached_results():
+    cache = Analysis.AnalysisCache()
+    cache.put(Engine.GameState().get_position_key(), Analysis.analyse_position([], 1, None, None))
+    results = [result for _, result in Analysis.analyse_game([], max_depth=2, workers=1, cache=cache)]
+    assert results[0]["depth"] == 2
+    assert cache.get(Engine.GameState().get_position_key())["depth"] == 2
+
+
+def test_hint_analyser_does_not_retry_failed_analyses():
+    analyser = Analysis.HintAnalyser(max_depth=1)
+    game_state = Engine.GameState()
+    try:
+        analyser.future = Future()
+        analyser.future.set_exception(RuntimeError("worker failed"))
+        analyser.future_position_key = game_state.get_position_key()
+        assert not analyser.update(game_state)
+        assert analyser.get_hints(game_state) is None
+        game_state = play_moves(["E2E4"])
+        assert analyser.update(game_state)
+        analyser.future.result(timeout=60)
+        assert not analyser.update(game_state)
+        assert analyser.get_hints(game_state)["depth"] == 1
+    finally:
+        analyser.close()
+
+
+def test_game_report_scores_played_moves_with_the_search_before_them():
+    report = Analysis.get_game_report(play_moves(["E2E4", "E7E5", "D1H5", "B8C6"]).moves_log, max_depth=2, workers=1)
+    assert report["plies"][3]["move"] == report["plies"][3]["best_move"] == "B8C6"
+    assert report["plies"][3]["loss"] == 0
+    assert report["blunders"] == []
+    report = Analysis.get_game_report(play_moves(["E2E4", "D7D5", "D1G4", "C8G4"]).moves_log, max_depth=2, workers=1)
+    assert report["blunders"] == [3]
+    assert report["plies"][2]["loss"] >= 800
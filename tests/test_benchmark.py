@@ -0,0 +1,27 @@
+"""
+This file contains the tests of the benchmark suite.
+"""
+# imports
+import Benchmark
+import Engine
+
+
+def test_get_regressions_ignores_slowdowns_within_the_confidence_interval():
+    baseline = {"noisy": {"ops_per_sec": 1000.0, "ci": 10.0}, "slower": {"ops_per_sec": 1000.0, "ci": 10.0}}
+    results = {"noisy": {"ops_per_sec": 850.0, "ci": 100.0}, "slower": {"ops_per_sec": 850.0, "ci": 10.0}}
+    assert Benchmark.get_regressions(results, baseline, 0.1) == [("slower", 1000.0, 850.0)]
+
+
+def test_t_values_are_never_below_the_exact_values():
+    assert Benchmark.get_t_value(9) == 2.262
+    assert Benchmark.get_t_value(24) == 2.086
+    assert Benchmark.get_t_value(35) == 2.042
+    assert Benchmark.get_t_value(1000) == 1.980
+
+
+def test_corpus_positions_exercise_their_special_moves():
+    moves = {name: [Engine.get_chess_notation_for_move(move)
+                    for move in Engine.get_game_state_from_fen(fen).get_valid_moves()]
+             for name, fen in Benchmark.CORPUS.items()}
+    assert "E1G1" in moves["castling"] and "E1C1" in moves["castling"]
+    assert "E5F6" in moves["en_passant"]
@@ -0,0 +1,35 @@
+"""
+This file contains the tests of the game logic.
+"""
+# imports
+import pytest
+
+import Engine
+
+
+def test_game_state_from_fen():
+    game_state = Engine.get_game_state_from_fen("r3k2r/8/8/3pP3/8/8/8/4K2R w Kq d6 0 1")
+    assert game_state.white_to_move
+    assert (game_state.white_king_right, game_state.white_queen_right, game_state.black_king_right,
+            game_state.black_queen_right) == (True, False, False, True)
+    assert game_state.en_passant_possible == (2, 3)
+    assert game_state.white_king_location == (7, 4)
+    assert game_state.black_king_location == (0, 4)
+    assert game_state.board[3][3] == "bP" and game_state.board[3][4] == "wP"
+    assert game_state.moves_log == []
+
+
+def test_game_state_from_fen_defaults():
+    game_state = Engine.get_game_state_from_fen("8/8/4k3/8/8/2K5/8/8 b")
+    assert not game_state.white_to_move
+    assert not (game_state.white_king_right or game_state.white_queen_right or game_state.black_king_right
+                or game_state.black_queen_right)
+    assert game_state.en_passant_possible == ()
+    assert game_state.white_king_location == (5, 2)
+    assert game_state.black_king_location == (2, 4)
+
+
+@pytest.mark.parametrize("fen", ["", "8/8/8/8/8/8/8 w - -", "8/8/8/8/8/8/8/7 w - -", "8/8/8/8/8/8/8/7x w - -"])
+def test_game_state_from_invalid_fen(fen):
+    with pytest.raises(ValueError):
+        Engine.get_game_state_from_fen(fen)
@@ -0,0 +1,22 @@
+"""
+This file contains the tests of the EPD test-suite runner.
+"""
+# imports
+import Epd
+
+POSITION = Epd.parse_epd_line('4k3/8/8/3q4/4P3/8/8/4K3 w - - bm exd5; id "pawn takes queen";')
+
+
+def test_position_is_not_solved_without_a_completed_depth():
+    result = Epd.run_position(POSITION["fen"], POSITION["operations"]["bm"], [], 0.0)
+    assert result["depth"] == 0
+    assert not result["solved"]
+    assert result["time_to_solution"] is None
+
+
+def test_suite_summary_uses_search_times():
+    report = Epd.run_suite([POSITION], [1.0], workers=1)
+    result = report["results"][0]
+    assert result["id"] == "pawn takes queen"
+    assert result["solved"] and result["move"] == "exd5"
+    assert report["summary"][0]["nps"] == result["nodes"] / result["time"]
@@ -0,0 +1,45 @@
+"""
+This file contains the tests of the feature extraction.
+"""
+# imports
+import numpy as np
+
+import Engine
+import Features
+
+from utils import EMPTY_SQUARE
+
+
+def get_board_from_record(record):
+    """
+    Function that rebuilds the board of a position from its record.
+    :param record: A record of RECORD_DTYPE.
+    :return: A list of 8 lists of 8 strings, as found in GameState.board.
+    """
+    squares = [EMPTY_SQUARE] * 64
+    for plane, square in zip(*np.nonzero(record["planes"])):
+        squares[square] = Features.PLANE_PIECES[plane]
+    return [squares[row * 8:row * 8 + 8] for row in range(8)]
+
+
+def test_game_positions_round_trip(tmp_path):
+    game_state = Engine.GameState()
+    boards = [[list(row) for row in game_state.board]]
+    for move in ["E2E4", "D7D5", "E4D5", "C7C6", "D5C6", "G8F6", "C6B7", "A7A6", "G1F3", "F6E4", "B7A8N"]:
+        game_state.get_valid_moves()
+        game_state.register_move(Engine.get_computer_notation_for_move(move))
+        if len(move) == 5:
+            game_state.promote(move[4])
+        boards.append([list(row) for row in game_state.board])
+    assert Features.extract_features(Features.get_game_positions(game_state.moves_log, 1.0), tmp_path, 4) == 12
+    records = np.concatenate(Features.open_shards(tmp_path))
+    assert [get_board_from_record(record) for record in records] == boards
+    assert records[-1]["legal_moves"] == len(game_state.get_valid_moves())
+
+
+def test_shard_numbering_continues_after_existing_shards(tmp_path):
+    positions = [(Engine.GameState(), 0.0)] * 3
+    Features.extract_features(positions, tmp_path, 2)
+    Features.extract_features(positions, tmp_path, 2)
+    assert Features.get_shard_names(tmp_path) == ["shard_%05d.npy" % number for number in range(4)]
+    assert sum(len(shard) for shard in Features.open_shards(tmp_path)) == 6
@@ -0,0 +1,62 @@
+"""
+This file contains the tests of the mate solver.
+"""
+# imports
+import Engine
+import MateSolver
+
+MATE_IN_1 = "k7/8/1K6/8/8/8/8/7R w - - 0 1"
+MATE_IN_2 = "kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1"
+
+
+def is_checkmate(fen, line):
+    """
+    Function that plays a line from a position and tells if it ends with a checkmate.
+    :param fen: The position, in FEN.
+    :param line: A list of strings representing moves in chess notation: ["A1A6", "B7A6", "B6B7"]
+    :return: True if the position after the line is a checkmate, False otherwise.
+    """
+    game_state = Engine.get_game_state_from_fen(fen)
+    for move in line:
+        assert Engine.get_computer_notation_for_move(move) in game_state.get_valid_moves()
+        game_state.register_move(Engine.get_computer_notation_for_move(move))
+    game_state.get_valid_moves()
+    return game_state.check_mate
+
+
+def test_mate_in_1_is_proven():
+    result = MateSolver.solve_puzzle(MATE_IN_1, 1)
+    assert result["status"] == "mate"
+    assert result["line"] == ["H1H8"]
+
+
+def test_mate_in_2_is_proven():
+    result = MateSolver.solve_puzzle(MATE_IN_2, 2)
+    assert result["status"] == "mate"
+    assert result["line"][0] == "A1A6" and len(result["line"]) == 3
+    assert is_checkmate(MATE_IN_2, result["line"])
+
+
+def test_mate_in_2_is_not_a_mate_in_1():
+    result = MateSolver.solve_puzzle(MATE_IN_2, 1)
+    assert result["status"] == "no_mate"
+    assert result["line"] == []
+
+
+def test_node_limit_leaves_the_puzzle_unknown():
+    result = MateSolver.solve_puzzle(MATE_IN_2, 2, max_nodes=3)
+    assert result["status"] == "unknown"
+    assert result["line"] == []
+
+
+def test_solve_puzzles_keeps_the_order_of_the_puzzles():
+    puzzles = [(MATE_IN_2, 2), (MATE_IN_1, 1), (MATE_IN_2, 1)]
+    results = list(MateSolver.solve_puzzles(puzzles, workers=2))
+    assert [(result["fen"], result["mate_in"]) for result in results] == puzzles
+    assert [result["status"] for result in results] == ["mate", "mate", "no_mate"]
+
+
+def test_read_puzzles_skips_comments_and_empty_lines(tmp_path):
+    path = tmp_path / "puzzles.txt"
+    path.write_text("# mate puzzles\n\n%s; 1\n   \n# %s; 2\n%s ;2\n" % (MATE_IN_1, MATE_IN_2, MATE_IN_2))
+    assert MateSolver.read_puzzles(path) == [(MATE_IN_1, 1), (MATE_IN_2, 2)]
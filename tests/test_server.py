@@ -0,0 +1,82 @@
+"""
+This file contains the tests of the game server, run through a socket.
+"""
+# imports
+import asyncio
+import json
+
+from Server import GameServer
+
+
+async def send_requests(port, requests):
+    """
+    Function that sends requests to a game server one at a time and collects the responses.
+    :param port: The port the server listens on.
+    :param requests: A list of dictionaries holding requests.
+    :return: A list of dictionaries holding the responses.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    for request in requests:
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+        responses.append(json.loads(await reader.readline()))
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+async def run_session(requests):
+    """
+    Function that starts a game server, opens a session and sends requests on it.
+    :param requests: A list of dictionaries holding requests, sent on the session unless they set their "session".
+    :return: A list of dictionaries holding the responses.
+    """
+    game_server = GameServer(workers=1)
+    server = await game_server.start()
+    port = server.sockets[0].getsockname()[1]
+    try:
+        session_id = (await send_requests(port, [{"op": "new"}]))[0]["session"]
+        return await send_requests(port, [dict({"session": session_id}, **request) for request in requests])
+    finally:
+        server.close()
+        await server.wait_closed()
+        game_server.close()
+
+
+def test_pawn_reaching_seventh_rank_does_not_await_promotion():
+    moves = ["E2E4", "D7D5", "E4D5", "C7C6", "D5C6", "G8F6", "C6B7", "A7A6"]
+    responses = asyncio.run(run_session([{"op": "move", "move": move} for move in moves] +
+                                        [{"op": "move", "move": "G1F3"}, {"op": "legal_moves"}]))
+    assert all(response["ok"] for response in responses)
+    assert not responses[len(moves) - 1]["await_promotion"]
+    assert len(responses[-1]["moves"]) != 0
+
+
+def test_think_rejects_invalid_limits():
+    responses = asyncio.run(run_session([{"op": "think", "depth": "abc"}, {"op": "think", "time": "abc"},
+                                         {"op": "think", "nodes": -1}, {"op": "think", "depth": 1}]))
+    assert [response["ok"] for response in responses] == [False, False, False, True]
+    assert responses[0]["error"] == "Invalid depth"
+    assert responses[-1]["depth"] == 1
+
+
+def test_least_recently_used_sessions_are_compacted():
+    game_server = GameServer(workers=1, max_active_sessions=2)
+    try:
+        session_ids = [game_server.new_session({})["session"] for _ in range(4)]
+        assert [game_server.sessions[session_id].is_compacted() for session_id in session_ids] == \
+            [True, True, False, False]
+        game_server.move({"session": session_ids[0], "move": "E2E4"})
+        assert list(game_server.active_sessions) == [session_ids[3], session_ids[0]]
+        assert game_server.get_server_metrics()["active_sessions"] == 2
+        assert game_server.compactions == 3
+    finally:
+        game_server.close()
+
+
+def test_every_request_line_gets_one_response_line():
+    responses = asyncio.run(run_session([{"op": ["x"]}, {"op": "move", "session": [1]}, {"op": "move", "move": 42},
+                                         {"op": "legal_moves"}]))
+    assert [response["ok"] for response in responses] == [False, False, False, True]
+    assert responses[0]["error"] == responses[1]["error"] == "Invalid request"
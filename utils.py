@@ -30,6 +30,9 @@ ROWS_TO_RANKS = {0: "8", 1: "7", 2: "6", 3: "5", 4: "4", 5: "3", 6: "2", 7: "1"}
 FILES_TO_COLUMNS = {"A": 0, "B": 1, "C": 2, "D": 3, "E": 4, "F": 5, "G": 6, "H": 7}
 RANKS_TO_ROWS = {"8": 0, "7": 1, "6": 2, "5": 3, "4": 4, "3": 5, "2": 6, "1": 7}
 
+# Pieces a Pawn can be promoted to:
+PROMOTION_PIECES = ["Q", "R", "B", "N"]
+
 # Special rules:
 EN_PASSANT = "EP"
 QUEEN_CASTLING = "QC"
@@ -43,14 +46,8 @@ KING_COL_MODIFIERS = [-1, 0, 1, -1, 1, -1, 0, 1]
 KNIGHT_ROW_MODIFIERS = [1, 2, 2, 1, -1, -2, -2, -1]
 KNIGHT_COL_MODIFIERS = [2, 1, -1, -2, -2, -1, 1, 2]
 
-
-# GUI constants
-MAX_FPS = 15
-HEIGHT = WIDTH = 512  # Window size
-DIMENSION = 8  # Dimensions of a chess board (8x8)
-SQUARE_SIZE = HEIGHT // DIMENSION  # Size of a board square in the GUI
-IMAGES = {}
-PROMOTION_TEXT = "Press R to promote to Rook\n" \
-                 "Press Q to promote to Queen\n" \
-                 "Press B to promote to Bishop\n" \
-                 "Press N to promote to Knight"
+# Search constants
+PIECE_VALUES = {"P": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}  # Piece values in centipawns
+CHECKMATE_SCORE = 100000  # Score of a checkmate, lowered by the number of plies needed to reach it
+DEFAULT_PROMOTION = "Q"  # Piece a Pawn is promoted to when searching
+BLUNDER_THRESHOLD = 200  # Loss in centipawns from which a move is flagged as a blunder